@@ -10,15 +10,25 @@ Provides stable APIs used by Codex tasks:
 
 import os
 import json
+import mmap
 import asyncio
+import threading
+import time
+import importlib.util
 from datetime import datetime
 from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 try:
     import fcntl
 except Exception:  # pragma: no cover
     fcntl = None  # type: ignore
 
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
 try:
     from dotenv import load_dotenv
 except Exception:  # pragma: no cover
@@ -27,8 +37,14 @@ except Exception:  # pragma: no cover
 
 try:
     from telegram import Bot
+    from telegram.error import RetryAfter
+    from telegram.helpers import escape_markdown
+    from telegram.request import HTTPXRequest
 except Exception:  # pragma: no cover
     Bot = None  # type: ignore
+    RetryAfter = None  # type: ignore
+    escape_markdown = None  # type: ignore
+    HTTPXRequest = None  # type: ignore
 
 try:
     import memory
@@ -38,50 +54,192 @@ except Exception:  # pragma: no cover
     except Exception:
         from all_new_cbot import memory  # type: ignore
 
+try:
+    import queue_journal
+except Exception:  # pragma: no cover
+    try:
+        from codex_cbot_telegram import queue_journal  # type: ignore
+    except Exception:
+        from all_new_cbot import queue_journal  # type: ignore
+
 # Load environment
 load_dotenv()
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-ALLOWED_USERS = [int(u.strip()) for u in os.getenv("TELEGRAM_ALLOWED_USERS", "").split(",") if u.strip()]
+# Parsed once for every module; ALLOWED_USER_IDS keeps the configured order.
+ALLOWED_USER_IDS = tuple(int(u.strip()) for u in os.getenv("TELEGRAM_ALLOWED_USERS", "").split(",") if u.strip())
+ALLOWED_USERS = frozenset(ALLOWED_USER_IDS)
 
 _DIR = os.path.dirname(os.path.abspath(__file__))
 MESSAGES_FILE = os.path.join(_DIR, "messages.json")
 WORKING_FILE = os.path.join(_DIR, "working.json")
 WEB_OUTBOX_FILE = os.path.join(_DIR, "web_outbox.json")
+# Append-only ack journal; folded into messages.json every ACK_COMPACT_EVERY acks.
+PROCESSED_LOG = os.path.join(_DIR, "processed.jsonl")
+ACK_COMPACT_EVERY = max(1, int(os.getenv("CBOT_ACK_COMPACT_EVERY", "16")))
+# listener.py appends new Telegram messages here (and the polling offset to LAST_UPDATE_FILE);
+# the entries are folded into messages.json together with the ack journal.
+INBOX_LOG = os.path.join(_DIR, "messages.jsonl")
+LAST_UPDATE_FILE = os.path.join(_DIR, "last_update_id.txt")
 MESSAGE_CHANNEL = os.getenv("MESSAGE_CHANNEL", "telegram").strip().lower()
+# Set CBOT_MULTIPROC=0 to skip flock on files this process owns alone (the web outbox).
+# The queue files are always flocked: listener.py appends to the inbox from its own process.
+MULTIPROC = os.getenv("CBOT_MULTIPROC", "1").strip().lower() in ("1", "true", "yes", "on")
 
+# event loop -> (Bot, closer task). A Bot's HTTP pool is bound to the loop that first used it,
+# so each loop gets its own, and the closer shuts that pool down before the loop finishes.
+# A plain dict: the closer task references its loop, so weak keys would never be collected.
+# Entries leave when their closer runs, or via the closed-loop sweep in _get_bot().
+_BOTS = {}
 
-def load_json(path, default):
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            pass
-    return default
+# (epoch second, "YYYY-MM-DD HH:MM:SS") reused until the second rolls over.
+_TS_CACHE = (None, "")
+
+# event loop -> [(outbox entry, future)] waiting for the next web_outbox.json write,
+# and event loop -> the task currently draining that list.
+_WEBMOCK_PENDING = {}
+_WEBMOCK_FLUSHERS = {}
+
+# Markdown sends that still had to be retried as plain text after _md_safe().
+_MD_FALLBACKS = 0
+
+
+# Queue files past this size are parsed from an mmap instead of being read into a bytes copy.
+_MMAP_MIN_BYTES = 1 << 20
+
+# path -> (stat signature, parsed document). os.replace() gives every save a new inode,
+# so (inode, mtime, size) changes whenever any process rewrites the file.
+_JSON_CACHE = {}
+
+# (messages list, {message_id: index}, entries indexed) for the cached queue document.
+# Appends extend the index in place; a different list object means a reload, so rebuild.
+_MSG_INDEX = (None, {}, 0)
+
+
+def _dumps(data: Any, pretty: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(raw: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _stat_key(st):
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _read_json_file(path, size):
+    with open(path, "rb") as f:
+        if orjson is not None and size >= _MMAP_MIN_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+        return _loads(f.read())
 
 
-def save_json(path, data):
+def load_json(path: str, default: Any) -> Any:
+    """Load JSON, re-parsing only when the file changed since the last load/save.
+
+    The returned document is shared with the cache: callers that mutate it must
+    persist the result with save_json().
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        _JSON_CACHE.pop(path, None)
+        return default
+    key = _stat_key(st)
+    cached = _JSON_CACHE.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        data = _read_json_file(path, st.st_size)
+    except Exception:
+        return default
+    _JSON_CACHE[path] = (key, data)
+    return data
+
+
+def save_json(path: str, data: Any, *, pretty: bool = False) -> None:
+    """Atomically write JSON; pretty=True only for files people read by hand."""
+    _JSON_CACHE.pop(path, None)
+    buf = _dumps(data, pretty=pretty)
     tmp = f"{path}.tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(tmp, "wb") as f:
+        f.write(buf)
     os.replace(tmp, path)
+    try:
+        _JSON_CACHE[path] = (_stat_key(os.stat(path)), data)
+    except OSError:
+        pass
+
+
+_INPROC_LOCKS = {}
+_INPROC_LOCKS_GUARD = threading.Lock()
+# Lock-file directories already created by this process.
+_ENSURED_DIRS = set()
+
+
+def _inproc_lock(path):
+    lock = _INPROC_LOCKS.get(path)
+    if lock is None:
+        with _INPROC_LOCKS_GUARD:
+            lock = _INPROC_LOCKS.setdefault(path, threading.Lock())
+    return lock
 
 
 @contextmanager
-def _file_lock(path):
-    lock_path = f"{path}.lock"
-    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
-    with open(lock_path, "a+", encoding="utf-8") as lock_file:
-        if fcntl is not None:
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
-        try:
+def _file_lock(path, shared=False):
+    # Threads in this process queue on a cheap in-memory lock; flock is only for other processes.
+    # shared=True marks files another process writes too, which are flocked even with MULTIPROC off.
+    with _inproc_lock(path):
+        if fcntl is None or not (MULTIPROC or shared):
             yield
-        finally:
-            if fcntl is not None:
+            return
+        lock_path = f"{path}.lock"
+        lock_dir = os.path.dirname(lock_path)
+        if lock_dir not in _ENSURED_DIRS:
+            os.makedirs(lock_dir, exist_ok=True)
+            _ENSURED_DIRS.add(lock_dir)
+        with open(lock_path, "a+", encoding="utf-8") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
                 fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
 
 
+def is_allowed(user_id):
+    """Return True when user_id may use the bot (no allow-list means everyone)."""
+    return not ALLOWED_USERS or user_id in ALLOWED_USERS
+
+
+def _now_str() -> str:
+    """Return local time as "YYYY-MM-DD HH:MM:SS[.ffffff]", caching the formatted date/time text per second."""
+    global _TS_CACHE
+    now = time.time()
+    sec = int(now)
+    cached_sec, prefix = _TS_CACHE
+    if cached_sec != sec:
+        prefix = datetime.fromtimestamp(sec).strftime("%Y-%m-%d %H:%M:%S")
+        _TS_CACHE = (sec, prefix)
+    micros = int((now - sec) * 1_000_000)
+    return f"{prefix}.{micros:06d}" if micros else prefix
+
+
 def _normalize_saved_path(path):
+    path = os.fspath(path)
+    if os.path.isabs(path):
+        # Absolute paths under _DIR need neither getcwd() nor relpath()'s component walk.
+        target = os.path.normpath(path)
+        prefix = _DIR if _DIR.endswith(os.sep) else _DIR + os.sep
+        if target.startswith(prefix):
+            return target[len(prefix):]
     abs_target = os.path.abspath(path)
     try:
         return os.path.relpath(abs_target, _DIR)
@@ -89,55 +247,189 @@ def _normalize_saved_path(path):
         return abs_target
 
 
-def _append_webmock_message(entry):
+def _telegram_ready(action, detail):
+    if Bot is None:
+        print(f"[CORE] python-telegram-bot not installed. {action} skipped.")
+        return False
+    if not BOT_TOKEN or BOT_TOKEN in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
+        print(f"[CORE][MOCK] BOT_TOKEN not set: {detail}")
+        return False
+    return True
+
+
+def _build_request():
+    # One pooled client per Bot; HTTP/2 multiplexes chunk/photo/document sends when h2 is installed.
+    return HTTPXRequest(
+        connection_pool_size=16,
+        read_timeout=30,
+        write_timeout=30,
+        connect_timeout=10,
+        pool_timeout=5,
+        http_version="2" if importlib.util.find_spec("h2") is not None else "1.1",
+    )
+
+
+async def _shutdown_bot(bot):
+    # Bot.shutdown() returns early unless initialize() ran, which sends never do, so the
+    # pooled request is closed directly as well. Both are idempotent.
+    for close in (bot.shutdown, bot.request.shutdown):
+        try:
+            await close()
+        except Exception:
+            pass  # best effort: a pool from a closed loop may not close cleanly
+
+
+async def _close_bot_with_loop(loop, bot):
+    """Wait until asyncio.run() cancels leftover tasks at loop exit, then close the bot's pool."""
+    try:
+        await loop.create_future()
+    finally:
+        if _BOTS.get(loop, (None,))[0] is bot:
+            del _BOTS[loop]
+        await _shutdown_bot(bot)
+
+
+def _get_bot():
+    """Return a Bot bound to the running event loop, reusing its keep-alive pool."""
+    loop = asyncio.get_running_loop()
+    entry = _BOTS.get(loop)
+    if entry is not None:
+        return entry[0]
+    # Loops closed without cancelling their tasks never ran their closer; close those pools here.
+    for stale in [l for l in _BOTS if l.is_closed()]:
+        stale_bot, _ = _BOTS.pop(stale)
+        loop.create_task(_shutdown_bot(stale_bot))
+    bot = Bot(token=BOT_TOKEN, request=_build_request()) if HTTPXRequest is not None else Bot(token=BOT_TOKEN)
+    # The entry holds the closer task so it is not garbage-collected while it waits.
+    _BOTS[loop] = (bot, loop.create_task(_close_bot_with_loop(loop, bot)))
+    return bot
+
+
+_DOCUMENT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def _read_file_bytes(path, max_size=None):
+    """Read an upload in one open(); returns None if it exceeds max_size."""
+    with open(path, "rb") as f:
+        if max_size is not None:
+            size = os.fstat(f.fileno()).st_size
+            if size > max_size:
+                print(f"[TELEGRAM] File too large (>50MB): {size / 1024 / 1024:.1f}MB")
+                return None
+        return f.read()
+
+
+def _iter_text_chunks(text, size=4000):
+    """Yield Telegram-sized slices lazily instead of materializing every chunk up front."""
+    if len(text) <= size:
+        yield text
+        return
+    for start in range(0, len(text), size):
+        yield text[start : start + size]
+
+
+def _retry_delay(exc):
+    delay = getattr(exc, "retry_after", 1)
+    if hasattr(delay, "total_seconds"):
+        delay = delay.total_seconds()
+    return max(float(delay), 0.0)
+
+
+def _md_safe(text):
+    """Escape legacy-Markdown markers when they cannot all pair up, so Telegram accepts the first send."""
+    if escape_markdown is None:
+        return text
+    if text.count("*") % 2 or text.count("_") % 2 or text.count("`") % 2 or text.count("[") != text.count("]"):
+        return escape_markdown(text, version=1)
+    return text
+
+
+async def _send_text_chunk(bot, chat_id, text, parse_mode):
+    """Send one chunk, waiting out Telegram flood control once before giving up."""
+    try:
+        return await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+    except Exception as e:
+        if RetryAfter is None or not isinstance(e, RetryAfter):
+            raise
+        await asyncio.sleep(_retry_delay(e))
+        return await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+
+
+def _write_webmock_entries(entries):
     with _file_lock(WEB_OUTBOX_FILE):
         data = load_json(WEB_OUTBOX_FILE, {"messages": []})
-        data.setdefault("messages", []).append(entry)
+        data.setdefault("messages", []).extend(entries)
         save_json(WEB_OUTBOX_FILE, data)
-    return True
+
+
+async def _flush_webmock(loop):
+    # Single flusher per loop: batches are written in order, and the file lock
+    # (which may block on flock) is taken on a worker thread, not the event loop.
+    try:
+        while _WEBMOCK_PENDING.get(loop):
+            batch = _WEBMOCK_PENDING.pop(loop)
+            try:
+                await asyncio.to_thread(_write_webmock_entries, [entry for entry, _ in batch])
+            except Exception as exc:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_result(True)
+    finally:
+        _WEBMOCK_FLUSHERS.pop(loop, None)
+
+
+async def _append_webmock_message(entry):
+    """Queue an outbox entry; entries queued while a write is pending share the next locked write."""
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    _WEBMOCK_PENDING.setdefault(loop, []).append((entry, fut))
+    if loop not in _WEBMOCK_FLUSHERS:
+        _WEBMOCK_FLUSHERS[loop] = loop.create_task(_flush_webmock(loop))
+    return await fut
 
 
 async def send_message(chat_id, text, parse_mode="Markdown"):
     """Send Telegram message with chunking and markdown fallback."""
+    global _MD_FALLBACKS
     if MESSAGE_CHANNEL == "webmock":
-        return _append_webmock_message(
+        return await _append_webmock_message(
             {
                 "type": "message",
                 "chat_id": int(chat_id),
                 "text": str(text),
                 "parse_mode": parse_mode,
-                "timestamp": str(datetime.now()),
+                "timestamp": _now_str(),
             }
         )
 
-    if Bot is None:
-        print("[CORE] python-telegram-bot not installed. send_message skipped.")
-        return False
-
-    if not BOT_TOKEN or BOT_TOKEN in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
-        print(f"[CORE][MOCK] BOT_TOKEN not set: {str(text)[:100]}")
+    if not _telegram_ready("send_message", str(text)[:100]):
         return False
 
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = _get_bot()
         text = str(text)
 
-        if len(text) > 4000:
-            chunks = [text[i : i + 4000] for i in range(0, len(text), 4000)]
-            for i, chunk in enumerate(chunks):
-                if i > 0:
-                    await asyncio.sleep(0.5)
-                await bot.send_message(chat_id=chat_id, text=chunk, parse_mode=parse_mode)
-        else:
-            await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+        # Chunks stay sequential so they arrive in order; only back off when
+        # Telegram actually asks for it instead of sleeping between every chunk.
+        for chunk in _iter_text_chunks(text):
+            if parse_mode == "Markdown":
+                chunk = _md_safe(chunk)
+            await _send_text_chunk(bot, chat_id, chunk, parse_mode)
 
         print(f"[TELEGRAM] Sent to {chat_id}: {text[:80]}")
         return True
     except Exception as e:
         print(f"[TELEGRAM] Send failed: {e}")
         if parse_mode == "Markdown":
+            _MD_FALLBACKS += 1
+            if _MD_FALLBACKS in (1, 10) or _MD_FALLBACKS % 100 == 0:
+                print(f"[TELEGRAM][WARN] Markdown send fell back to plain text ({_MD_FALLBACKS} so far)")
             try:
-                bot = Bot(token=BOT_TOKEN)
+                bot = _get_bot()
                 await bot.send_message(chat_id=chat_id, text=str(text), parse_mode=None)
                 return True
             except Exception:
@@ -151,32 +443,32 @@ async def send_photo(chat_id, photo_path, caption=None):
         if not os.path.exists(photo_path):
             print(f"[WEBMOCK] File missing: {photo_path}")
             return False
-        return _append_webmock_message(
+        return await _append_webmock_message(
             {
                 "type": "photo",
                 "chat_id": int(chat_id),
                 "photo_path": _normalize_saved_path(photo_path),
                 "caption": caption or "",
-                "timestamp": str(datetime.now()),
+                "timestamp": _now_str(),
             }
         )
 
-    if Bot is None:
-        print("[CORE] python-telegram-bot not installed. send_photo skipped.")
+    if not _telegram_ready("send_photo", f"photo={photo_path}"):
         return False
 
-    if not BOT_TOKEN or BOT_TOKEN in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
-        print(f"[CORE][MOCK] BOT_TOKEN not set: photo={photo_path}")
-        return False
-
-    if not os.path.exists(photo_path):
+    try:
+        # Read off the event loop so a large file does not stall other coroutines.
+        photo_bytes = await asyncio.to_thread(_read_file_bytes, photo_path)
+    except FileNotFoundError:
         print(f"[TELEGRAM] File missing: {photo_path}")
         return False
+    except OSError as e:
+        print(f"[TELEGRAM] Photo send failed: {e}")
+        return False
 
     try:
-        bot = Bot(token=BOT_TOKEN)
-        with open(photo_path, "rb") as photo_file:
-            await bot.send_photo(chat_id=chat_id, photo=photo_file, caption=caption)
+        bot = _get_bot()
+        await bot.send_photo(chat_id=chat_id, photo=photo_bytes, caption=caption)
         print(f"[TELEGRAM] Photo sent to {chat_id}: {photo_path}")
         return True
     except Exception as e:
@@ -190,42 +482,38 @@ async def send_document(chat_id, file_path, caption=None):
         if not os.path.exists(file_path):
             print(f"[WEBMOCK] File missing: {file_path}")
             return False
-        return _append_webmock_message(
+        return await _append_webmock_message(
             {
                 "type": "document",
                 "chat_id": int(chat_id),
                 "file_path": _normalize_saved_path(file_path),
                 "caption": caption or "",
-                "timestamp": str(datetime.now()),
+                "timestamp": _now_str(),
             }
         )
 
-    if Bot is None:
-        print("[CORE] python-telegram-bot not installed. send_document skipped.")
-        return False
-
-    if not BOT_TOKEN or BOT_TOKEN in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
-        print(f"[CORE][MOCK] BOT_TOKEN not set: doc={file_path}")
+    if not _telegram_ready("send_document", f"doc={file_path}"):
         return False
 
-    if not os.path.exists(file_path):
+    try:
+        doc_bytes = await asyncio.to_thread(_read_file_bytes, file_path, _DOCUMENT_MAX_BYTES)
+    except FileNotFoundError:
         print(f"[TELEGRAM] File missing: {file_path}")
         return False
-
-    file_size = os.path.getsize(file_path)
-    if file_size > 50 * 1024 * 1024:
-        print(f"[TELEGRAM] File too large (>50MB): {file_size / 1024 / 1024:.1f}MB")
+    except OSError as e:
+        print(f"[TELEGRAM] Document send failed: {e}")
+        return False
+    if doc_bytes is None:
         return False
 
     try:
-        bot = Bot(token=BOT_TOKEN)
-        with open(file_path, "rb") as doc_file:
-            await bot.send_document(
-                chat_id=chat_id,
-                document=doc_file,
-                caption=caption,
-                filename=os.path.basename(file_path),
-            )
+        bot = _get_bot()
+        await bot.send_document(
+            chat_id=chat_id,
+            document=doc_bytes,
+            caption=caption,
+            filename=os.path.basename(file_path),
+        )
         print(f"[TELEGRAM] Document sent to {chat_id}: {file_path}")
         return True
     except Exception as e:
@@ -233,27 +521,108 @@ async def send_document(chat_id, file_path, caption=None):
         return False
 
 
-def check_messages():
-    """Return unprocessed messages from messages.json."""
-    with _file_lock(MESSAGES_FILE):
-        data = load_json(MESSAGES_FILE, {"messages": [], "last_update_id": 0})
-    return [m for m in data.get("messages", []) if not m.get("processed")]
+def _compact_acks(data: Dict[str, Any], acked: Set[Tuple[Any, Any]], inbox: List[Dict[str, Any]]) -> None:
+    """Fold the inbox and ack journals into messages.json and truncate both.
+
+    The caller holds _file_lock(MESSAGES_FILE, shared=True), the flock listener.append_msgs
+    appends under, so no inbox line can land between the read and the truncate.
+    """
+    if inbox:
+        data.setdefault("messages", []).extend(inbox)
+        try:
+            with open(LAST_UPDATE_FILE, "r", encoding="utf-8") as f:
+                data["last_update_id"] = max(int(data.get("last_update_id") or 0), int(f.read().strip() or 0))
+        except (OSError, ValueError):
+            pass
+    for m in data.get("messages", []):
+        if queue_journal.ack_key(m) in acked:
+            m["processed"] = True
+    save_json(MESSAGES_FILE, data)
+    for path in (PROCESSED_LOG, INBOX_LOG) if inbox else (PROCESSED_LOG,):
+        with open(path, "w", encoding="utf-8"):
+            pass
 
 
-def mark_as_done(message_id, instruction=None, result_summary="", summary=None):
-    """Mark message as processed and update memory index."""
+def _find_message(messages: List[Dict[str, Any]], message_id: Any) -> Optional[Dict[str, Any]]:
+    global _MSG_INDEX
+    indexed, index, count = _MSG_INDEX
+    if indexed is not messages or count > len(messages):
+        index, count = {}, 0
+    for i in range(count, len(messages)):
+        index.setdefault(messages[i].get("message_id"), i)
+    _MSG_INDEX = (messages, index, len(messages))
+    i = index.get(message_id)
+    if i is not None and messages[i].get("message_id") == message_id:
+        return messages[i]
+    if i is not None:
+        # The list was edited in place; fall back to a scan and rebuild next time.
+        _MSG_INDEX = (None, {}, 0)
+        return next((m for m in messages if m.get("message_id") == message_id), None)
+    return None
+
+
+def check_messages() -> List[Dict[str, Any]]:
+    """Return unprocessed messages from messages.json."""
+    with _file_lock(MESSAGES_FILE, shared=True):
+        data = load_json(MESSAGES_FILE, {"messages": [], "last_update_id": 0})
+        acked = queue_journal.load_acked(PROCESSED_LOG)
+        inbox = queue_journal.load_inbox(INBOX_LOG)
+    queue = data.get("messages", [])
+    if inbox:
+        queue = queue + inbox
+    # Copies keep callers from mutating the cached queue document.
+    return [dict(m) for m in queue if queue_journal.is_pending(m, acked)]
+
+
+def _ack_target(
+    messages: List[Dict[str, Any]],
+    inbox: List[Dict[str, Any]],
+    message_id: Any,
+    chat_id: Any,
+    acked: Set[Tuple[Any, Any]],
+) -> Optional[Dict[str, Any]]:
+    """First pending message with this id (and chat, if given), else the first one at all."""
+    hit = _find_message(messages, message_id)
+    if hit is not None and chat_id in (None, hit.get("chat_id")) and queue_journal.is_pending(hit, acked):
+        return hit
+    # No hit means no match anywhere in messages, so only the inbox is left to search.
+    first = None
+    for m in inbox if hit is None else messages + inbox:
+        if m.get("message_id") == message_id and chat_id in (None, m.get("chat_id")):
+            if queue_journal.is_pending(m, acked):
+                return m
+            first = first or m
+    return first
+
+
+def mark_as_done(
+    message_id: Any,
+    instruction: Optional[str] = None,
+    result_summary: str = "",
+    summary: Optional[str] = None,
+    chat_id: Any = None,
+) -> None:
+    """Mark message as processed and update memory index.
+
+    Pass chat_id when message ids may repeat across chats; otherwise the first pending
+    message with message_id is marked.
+    """
     if summary is not None and not result_summary:
         result_summary = summary
 
-    with _file_lock(MESSAGES_FILE):
+    with _file_lock(MESSAGES_FILE, shared=True):
         data = load_json(MESSAGES_FILE, {"messages": [], "last_update_id": 0})
-        target_msg = None
-        for m in data.get("messages", []):
-            if m.get("message_id") == message_id:
-                m["processed"] = True
-                target_msg = m
-                break
-        save_json(MESSAGES_FILE, data)
+        inbox = queue_journal.load_inbox(INBOX_LOG)
+        acked = queue_journal.load_acked(PROCESSED_LOG)
+        target_msg = _ack_target(data.get("messages", []), inbox, message_id, chat_id, acked)
+        if target_msg is not None:
+            # Ack is one appended line; the full queue rewrite is amortized over ACK_COMPACT_EVERY acks.
+            with open(PROCESSED_LOG, "ab") as f:
+                entry = {"chat_id": target_msg.get("chat_id"), "message_id": message_id, "time": _now_str()}
+                f.write(_dumps(entry) + b"\n")
+            acked.add(queue_journal.ack_key(target_msg))
+            if len(acked) >= ACK_COMPACT_EVERY:
+                _compact_acks(data, acked, inbox)
 
     if target_msg:
         memory.update_index(
@@ -274,19 +643,28 @@ def get_recent_history(limit=3):
 
 
 def set_working(status=True, message_id=None):
-    """Persist working state."""
+    """Persist working state; working.json only exists while the agent is busy."""
+    if not status:
+        _JSON_CACHE.pop(WORKING_FILE, None)
+        try:
+            os.unlink(WORKING_FILE)
+        except FileNotFoundError:
+            pass
+        return
     save_json(
         WORKING_FILE,
         {
-            "active": bool(status),
+            "active": True,
             "message_id": message_id,
-            "time": str(datetime.now()),
+            "time": _now_str(),
         },
     )
 
 
 def is_working():
     """Return True when agent is marked as busy."""
+    # Idle is a failed stat; busy is a stat plus a cached parse (files written before
+    # set_working(False) unlinked may still say "active": false).
     data = load_json(WORKING_FILE, {"active": False})
     return bool(data.get("active", False))
 
@@ -47,6 +47,7 @@ HAS_TASK="0"
 ROUTE="idle"
 ROUTE_REASON=""
 MESSAGE_ID=""
+CHAT_ID=""
 PROJECT_NAME=""
 INSTRUCTION=""
 TASK_TYPE=""
@@ -93,7 +94,7 @@ Transaction contract (mandatory):
 4. if long-running, send concise progress updates via core.send_message
 5. check generated result aligns with inferred domain intent; if mismatch is visible, regenerate once with corrected brief
 6. send major outputs via core.send_document/core.send_photo if files exist
-7. call core.mark_as_done(message_id=$MESSAGE_ID, instruction, summary)
+7. call core.mark_as_done(message_id=$MESSAGE_ID, chat_id=$CHAT_ID, instruction=..., summary=...)
 
 Be robust: prioritize semantic intent over literal keyword matching.
 Keep output concise and operational.
@@ -116,7 +117,7 @@ Transaction contract (mandatory):
    python3 skills/image_gen/image_gen.py "<instruction text>"
 4. if long-running, send concise progress updates via core.send_message
 5. if image generation succeeds, send image via core.send_photo with short caption
-6. call core.mark_as_done(message_id=$MESSAGE_ID, instruction, summary)
+6. call core.mark_as_done(message_id=$MESSAGE_ID, chat_id=$CHAT_ID, instruction=..., summary=...)
 
 If image_gen execution fails, perform a safe local fallback with canvas_render workflow.
 EOF
@@ -188,7 +189,7 @@ Previous detected niche from CLI/log: "$LAST_NICHE"
 
 Re-run web generation once with explicit domain anchors.
 For domain=cafe, include anchors like: "cafe coffee roastery menu".
-Then send corrected result and finalize with core.mark_as_done(message_id=$MESSAGE_ID, instruction, summary).
+Then send corrected result and finalize with core.mark_as_done(message_id=$MESSAGE_ID, chat_id=$CHAT_ID, instruction=..., summary=...).
 EOF
 )
       $CODEX_EXE exec --full-auto \
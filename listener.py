@@ -2,7 +2,7 @@
 codex_cbot_telegram - Real-time Listener (Cross-Platform)
 
 - Poll Telegram updates
-- Append messages to messages.json
+- Append messages to the messages.jsonl inbox (folded into messages.json by core)
 - Trigger Codex executor
 - Send intermediate progress from execution.log
 """
@@ -10,11 +10,23 @@ codex_cbot_telegram - Real-time Listener (Cross-Platform)
 import asyncio
 import json
 import os
+import re
 import shutil
-import subprocess
 import time
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 
+try:
+    import fcntl
+except Exception:  # pragma: no cover - non-POSIX
+    fcntl = None  # type: ignore
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - stdlib json fallback
+    orjson = None  # type: ignore
+
 try:
     from dotenv import load_dotenv
 except Exception:  # pragma: no cover - fallback for missing dependency
@@ -26,10 +38,17 @@ try:
 except Exception:  # pragma: no cover - fallback for missing dependency
     Bot = None  # type: ignore
 
+try:
+    import core
+except Exception:  # pragma: no cover
+    try:
+        from codex_cbot_telegram import core  # type: ignore
+    except Exception:
+        from all_new_cbot import core  # type: ignore
+
 load_dotenv()
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-ALLOWED_USERS = [int(u.strip()) for u in os.getenv("TELEGRAM_ALLOWED_USERS", "").split(",") if u.strip()]
 HEARTBEAT_INTERVAL = int(os.getenv("TELEGRAM_PROGRESS_HEARTBEAT", "45"))
 TASK_TIMEOUT = int(os.getenv("TELEGRAM_TASK_TIMEOUT", "900"))
 CODEX_MODEL = os.getenv("CODEX_MODEL", "gpt-5-codex")
@@ -39,39 +58,88 @@ RUN_MODE = os.getenv("RUN_MODE", "telegram").strip().lower()
 
 _DIR = os.path.dirname(os.path.abspath(__file__))
 MESSAGES_FILE = os.path.join(_DIR, "messages.json")
+# Append-only inbox + polling offset; core folds both into MESSAGES_FILE on ack compaction.
+MESSAGES_JSONL = os.path.join(_DIR, "messages.jsonl")
+LAST_ID_FILE = os.path.join(_DIR, "last_update_id.txt")
 EXEC_LOG = os.path.join(_DIR, "execution.log")
 EXECUTOR_SH = os.path.join(_DIR, "executor.sh")
 CODEX_MD = os.path.join(_DIR, "codex.md")
 
 _ACTIVE_PROCESS = None
+_LOG_FP = None
+_BOT = None
 
 
 def load_msgs():
     if os.path.exists(MESSAGES_FILE):
         try:
-            with open(MESSAGES_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(MESSAGES_FILE, "rb") as f:
+                raw = f.read()
+            return orjson.loads(raw) if orjson is not None else json.loads(raw)
         except Exception:
             pass
     return {"messages": [], "last_update_id": 0}
 
 
-def save_msgs(data):
-    with open(MESSAGES_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def _dumps_line(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
 
 
-def _read_log_increment(log_path, offset):
-    if not os.path.exists(log_path):
-        return [], offset
+@contextmanager
+def _queue_lock():
+    # Same lock file core._file_lock(MESSAGES_FILE) uses, so a fold never races an append.
+    if fcntl is None:
+        yield
+        return
+    with open(f"{MESSAGES_FILE}.lock", "a+", encoding="utf-8") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def load_last_update_id():
     try:
-        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
-            f.seek(offset)
-            chunk = f.read()
-            new_offset = f.tell()
-        return chunk.splitlines(), new_offset
+        with open(LAST_ID_FILE, "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return int(load_msgs().get("last_update_id") or 0)
+
+
+def append_msgs(new_msgs, last_update_id):
+    """Append one poll's messages to the inbox and persist the polling offset."""
+    with _queue_lock():
+        if new_msgs:
+            with open(MESSAGES_JSONL, "ab") as f:
+                f.write(b"".join(_dumps_line(m) for m in new_msgs))
+        tmp = f"{LAST_ID_FILE}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(last_update_id))
+        os.replace(tmp, LAST_ID_FILE)
+
+
+def _open_log(log_path, offset):
+    # "a+b" creates the log if the executor has not written it yet; it is only read here.
+    try:
+        log_fp = open(log_path, "a+b")
+    except OSError:
+        return None
+    log_fp.seek(offset)
+    return log_fp
+
+
+def _read_new_lines(log_fp):
+    if log_fp is None:
+        return []
+    try:
+        if os.fstat(log_fp.fileno()).st_size <= log_fp.tell():
+            return []
+        return log_fp.read().decode("utf-8", errors="replace").splitlines()
     except Exception:
-        return [], offset
+        return []
 
 
 def _tail_log(log_path, max_lines=30):
@@ -84,10 +152,25 @@ def _tail_log(log_path, max_lines=30):
         return []
 
 
+def _same_file(path, fp):
+    try:
+        return os.stat(path).st_ino == os.fstat(fp.fileno()).st_ino
+    except OSError:
+        return False
+
+
 def _append_log(line):
+    global _LOG_FP
     try:
-        with open(EXEC_LOG, "a", encoding="utf-8") as f:
-            f.write(line.rstrip() + "\n")
+        # Kept open between calls; reopened if execution.log was removed or replaced.
+        # Unbuffered: these are one-off status lines that /api/status/log and the progress
+        # monitor should see at once, so each is a single write() with nothing to batch.
+        if _LOG_FP is not None and not _same_file(EXEC_LOG, _LOG_FP):
+            _LOG_FP.close()
+            _LOG_FP = None
+        if _LOG_FP is None:
+            _LOG_FP = open(EXEC_LOG, "ab", buffering=0)
+        _LOG_FP.write((line.rstrip() + "\n").encode("utf-8"))
     except Exception:
         pass
 
@@ -101,29 +184,53 @@ def _is_enabled(raw_value):
     return str(raw_value).strip().lower() in ("1", "true", "yes", "on")
 
 
+# Checked in priority order: when a line matches several stages the earliest rule wins.
+_PROGRESS_RULES = [
+    ("recon", "Market/domain analysis in progress.", ("[recon]",)),
+    ("copy", "Copy strategy generation in progress.", ("[copy]",)),
+    ("variator", "Design variation selection in progress.", ("[variator]",)),
+    ("builder", "Building the web package.", ("[builder]",)),
+    ("assets", "Generating image assets.", ("[generate]", "image_gen subprocess")),
+    ("motion", "Applying motion/animation effects.", ("[motion]",)),
+    ("audit", "Running quality audit.", ("[audit]",)),
+    ("done", "Generation pipeline completed.", ("[done]", "pipeline complete")),
+    ("busy", "Codex is currently busy with another task.", ("[skip] codex busy",)),
+    ("warn", "Issue detected. Attempting recovery/check.", ("[error]", " failed")),
+]
+# One group per rule, so a single C-level scan finds every candidate stage.
+_PROGRESS_RE = re.compile(
+    "|".join("(" + "|".join(re.escape(p) for p in patterns) + ")" for _, _, patterns in _PROGRESS_RULES)
+)
+
+
 def _progress_from_line(line):
-    l = (line or "").lower()
-    if "[recon]" in l:
-        return ("recon", "Market/domain analysis in progress.")
-    if "[copy]" in l:
-        return ("copy", "Copy strategy generation in progress.")
-    if "[variator]" in l:
-        return ("variator", "Design variation selection in progress.")
-    if "[builder]" in l:
-        return ("builder", "Building the web package.")
-    if "[generate]" in l or "image_gen subprocess" in l:
-        return ("assets", "Generating image assets.")
-    if "[motion]" in l:
-        return ("motion", "Applying motion/animation effects.")
-    if "[audit]" in l:
-        return ("audit", "Running quality audit.")
-    if "[done]" in l or "pipeline complete" in l:
-        return ("done", "Generation pipeline completed.")
-    if "[skip] codex busy" in l:
-        return ("busy", "Codex is currently busy with another task.")
-    if "[error]" in l or " failed" in l:
-        return ("warn", "Issue detected. Attempting recovery/check.")
-    return (None, None)
+    return _progress_from_lowered((line or "").lower())
+
+
+def _progress_from_lowered(lowered):
+    best = None
+    for m in _PROGRESS_RE.finditer(lowered):
+        if best is None or m.lastindex < best:
+            best = m.lastindex
+            if best == 1:
+                break
+    if best is None:
+        return (None, None)
+    key, msg, _ = _PROGRESS_RULES[best - 1]
+    return (key, msg)
+
+
+def _is_error_line(line):
+    lowered = line.lower()
+    return "error" in lowered or "failed" in lowered
+
+
+def get_bot():
+    """One Bot for the listener process: polling and progress sends share its connection pools."""
+    global _BOT
+    if _BOT is None and Bot is not None and BOT_TOKEN:
+        _BOT = Bot(token=BOT_TOKEN)
+    return _BOT
 
 
 async def _send_progress(bot, chat_id, text):
@@ -135,25 +242,84 @@ async def _send_progress(bot, chat_id, text):
         print(f"[LISTENER] Progress send failed: {e}")
 
 
+async def _tee_to_log(stream, wake):
+    with open(EXEC_LOG, "ab", buffering=1 << 16) as log_file:
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                break
+            log_file.write(chunk)
+            log_file.flush()
+            wake.set()
+
+
+async def _wait_for_activity(process, wake, timeout):
+    """Sleep until the worker exits, streams more output, or timeout seconds pass."""
+    waiters = [asyncio.ensure_future(process.wait())]
+    if wake is not None:
+        waiters.append(asyncio.ensure_future(wake.wait()))
+    _, pending = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    for waiter in pending:
+        waiter.cancel()
+
+
+def _new_progress(lines, seen):
+    msgs = []
+    for line in lines:
+        key, msg = _progress_from_lowered(line.lower())
+        if key and msg and key not in seen:
+            msgs.append(msg)
+            seen.add(key)
+    return msgs
+
+
+async def _send_progress_batch(bot, chat_id, msgs):
+    """Stages that showed up in the same tick go out as one message (Telegram caps text at 4096)."""
+    if not msgs:
+        return False
+    batch = []
+    size = 0
+    for msg in msgs:
+        if batch and size + len(msg) + 1 > 4000:
+            await _send_progress(bot, chat_id, "\n".join(batch))
+            batch, size = [], 0
+        batch.append(msg)
+        size += len(msg) + 1
+    await _send_progress(bot, chat_id, "\n".join(batch))
+    return True
+
+
 async def _monitor_codex_progress(chat_id, process, log_offset):
     if not BOT_TOKEN or not chat_id or Bot is None:
         return
 
-    bot = Bot(token=BOT_TOKEN)
+    bot = get_bot()
+    # One handle for the whole run; each tick is an fstat, plus a read only when the log grew.
+    log_fp = _open_log(EXEC_LOG, log_offset)
+    try:
+        await _follow_codex_progress(bot, chat_id, process, log_fp)
+    finally:
+        if log_fp is not None:
+            log_fp.close()
+
+
+async def _follow_codex_progress(bot, chat_id, process, log_fp):
     start_time = time.time()
     last_heartbeat = start_time
     seen = set()
 
+    wake = getattr(process, "_cbot_output", None)
+    # Last lines this run produced; usually spares re-reading execution.log on failure.
+    recent = deque(maxlen=30)
     while True:
-        rc = process.poll()
+        rc = process.returncode
+        if wake is not None:
+            wake.clear()
 
-        lines, log_offset = _read_log_increment(EXEC_LOG, log_offset)
-        for line in lines:
-            key, msg = _progress_from_line(line)
-            if key and msg and key not in seen:
-                await _send_progress(bot, chat_id, msg)
-                seen.add(key)
-                last_heartbeat = time.time()
+        lines = await asyncio.to_thread(_read_new_lines, log_fp)
+        recent.extend(lines)
+        if await _send_progress_batch(bot, chat_id, _new_progress(lines, seen)):
+            last_heartbeat = time.time()
 
         elapsed = time.time() - start_time
         if elapsed > TASK_TIMEOUT:
@@ -162,12 +328,6 @@ async def _monitor_codex_progress(chat_id, process, log_offset):
             except Exception:
                 pass
             await _send_progress(bot, chat_id, f"Task timeout exceeded ({TASK_TIMEOUT}s).")
-            log_file = getattr(process, "_cbot_log_file", None)
-            if log_file:
-                try:
-                    log_file.close()
-                except Exception:
-                    pass
             return
 
         if rc is not None:
@@ -177,20 +337,23 @@ async def _monitor_codex_progress(chat_id, process, log_offset):
             await _send_progress(bot, chat_id, f"Task still running... ({int(elapsed)}s)")
             last_heartbeat = time.time()
 
-        await asyncio.sleep(2)
+        await _wait_for_activity(process, wake, 2)
 
-    lines, _ = _read_log_increment(EXEC_LOG, log_offset)
-    for line in lines:
-        key, msg = _progress_from_line(line)
-        if key and msg and key not in seen:
-            await _send_progress(bot, chat_id, msg)
-            seen.add(key)
+    tee = getattr(process, "_cbot_tee", None)
+    if tee is not None:
+        await tee
+    lines = await asyncio.to_thread(_read_new_lines, log_fp)
+    recent.extend(lines)
+    await _send_progress_batch(bot, chat_id, _new_progress(lines, seen))
 
     if process.returncode == 0:
         await _send_progress(bot, chat_id, "Automated task completed.")
     else:
-        tail = _tail_log(EXEC_LOG, max_lines=30)
-        err_line = next((x for x in reversed(tail) if "error" in x.lower() or "failed" in x.lower()), "")
+        if len(recent) == recent.maxlen:
+            tail = list(recent)
+        else:
+            tail = await asyncio.to_thread(_tail_log, EXEC_LOG, recent.maxlen)
+        err_line = next((x for x in reversed(tail) if _is_error_line(x)), "")
         if not err_line and tail:
             err_line = tail[-1]
         if err_line:
@@ -198,13 +361,6 @@ async def _monitor_codex_progress(chat_id, process, log_offset):
         else:
             await _send_progress(bot, chat_id, "Task failed. Check execution.log for details.")
 
-    log_file = getattr(process, "_cbot_log_file", None)
-    if log_file:
-        try:
-            log_file.close()
-        except Exception:
-            pass
-
 
 def _build_executor_command():
     strict_mode = _is_enabled(MACOS_STRICT_MODE)
@@ -219,7 +375,12 @@ def _build_executor_command():
 
     # Windows-safe fallback route: direct codex exec
     if shutil.which("codex"):
-        prompt = "Check messages.json and process the first 'processed: false' item using only core.py APIs, then mark as done."
+        # messages.json alone is stale: new messages sit in messages.jsonl and acks in
+        # processed.jsonl until core folds them in, so point codex at core.check_messages().
+        prompt = (
+            "Call core.check_messages() and process the first message it returns using only "
+            "core.py APIs, then finish with core.mark_as_done()."
+        )
         return [
             "codex", "exec",
             "--full-auto",
@@ -237,18 +398,17 @@ async def trigger_codex(chat_id=None, text=""):
 
     if _is_nested_codex_call_blocked():
         msg = "[ERROR] Nested Codex invocation blocked in listener (CODEX_THREAD_ID detected)."
-        _append_log(msg)
+        await asyncio.to_thread(_append_log, msg)
         print(f"[LISTENER] {msg}")
         if BOT_TOKEN and chat_id:
-            bot = Bot(token=BOT_TOKEN)
             await _send_progress(
-                bot,
+                get_bot(),
                 chat_id,
                 "Nested Codex call blocked. Run automation in a normal terminal or set ALLOW_NESTED_CODEX=1.",
             )
         return
 
-    if _ACTIVE_PROCESS and _ACTIVE_PROCESS.poll() is None:
+    if _ACTIVE_PROCESS and _ACTIVE_PROCESS.returncode is None:
         print("[LISTENER] Codex worker already running. Skip duplicate trigger.")
         return
 
@@ -259,51 +419,49 @@ async def trigger_codex(chat_id=None, text=""):
         else:
             msg = "[ERROR] Executor unavailable: bash/codex not found."
         print(f"[LISTENER] {msg}")
-        _append_log(msg)
+        await asyncio.to_thread(_append_log, msg)
         return
 
     print(f"[LISTENER] Codex trigger mode={mode} at {datetime.now().strftime('%H:%M:%S')}")
     log_offset = os.path.getsize(EXEC_LOG) if os.path.exists(EXEC_LOG) else 0
-    popen_kwargs = {}
-    if mode == "direct":
-        # Direct codex mode must write to execution.log for progress/error monitoring.
-        log_file = open(EXEC_LOG, "a", encoding="utf-8")
-        popen_kwargs["stdout"] = log_file
-        popen_kwargs["stderr"] = subprocess.STDOUT
-    proc = subprocess.Popen(cmd, cwd=_DIR, **popen_kwargs)
     if mode == "direct":
-        setattr(proc, "_cbot_log_file", log_file)
+        # Direct codex output is streamed into execution.log; each write wakes the progress monitor.
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, cwd=_DIR, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+        proc._cbot_output = asyncio.Event()
+        proc._cbot_tee = asyncio.create_task(_tee_to_log(proc.stdout, proc._cbot_output))
+    else:
+        # executor.sh appends to execution.log itself.
+        proc = await asyncio.create_subprocess_exec(*cmd, cwd=_DIR)
     _ACTIVE_PROCESS = proc
     if BOT_TOKEN and chat_id:
         asyncio.create_task(_monitor_codex_progress(chat_id, proc, log_offset))
 
 
-async def fetch_updates():
-    if Bot is None:
-        print("[LISTENER] python-telegram-bot is not installed. Skipping Telegram polling.")
-        return 0
-    if not BOT_TOKEN or BOT_TOKEN in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
-        print("[LISTENER] BOT_TOKEN not set. Check .env")
-        return 0
-
-    bot = Bot(token=BOT_TOKEN)
-    data = load_msgs()
-
-    try:
-        updates = await bot.get_updates(
-            offset=data["last_update_id"] + 1,
-            timeout=30,
-            allowed_updates=["message"],
-        )
-
-        new_count = 0
-        for u in updates:
-            if not u.message:
-                continue
-            if ALLOWED_USERS and u.message.from_user.id not in ALLOWED_USERS:
-                continue
-
-            msg_data = {
+async def fetch_updates(bot, last_update_id):
+    """Long-poll once; returns (newly queued messages, new polling offset)."""
+    updates = await bot.get_updates(
+        offset=last_update_id + 1,
+        timeout=30,
+        allowed_updates=["message"],
+    )
+    if not updates:
+        # Idle long-poll: nothing to parse and nothing to persist.
+        return [], last_update_id
+
+    new_msgs = []
+    max_update_id = last_update_id
+    for u in updates:
+        # Skipped updates still advance the offset so Telegram stops redelivering them.
+        max_update_id = max(max_update_id, u.update_id)
+        if not u.message:
+            continue
+        if not core.is_allowed(u.message.from_user.id):
+            continue
+
+        new_msgs.append(
+            {
                 "message_id": u.message.message_id,
                 "chat_id": u.message.chat_id,
                 "user": u.message.from_user.first_name,
@@ -311,18 +469,12 @@ async def fetch_updates():
                 "timestamp": str(datetime.now()),
                 "processed": False,
             }
-            data["messages"].append(msg_data)
-            if u.update_id > data["last_update_id"]:
-                data["last_update_id"] = u.update_id
-            new_count += 1
-
-        if new_count > 0:
-            save_msgs(data)
-            return new_count
-    except Exception as e:
-        print(f"[LISTENER] Polling error: {e}")
+        )
 
-    return 0
+    if max_update_id != last_update_id:
+        # Off the loop: the append waits on the queue flock while core compacts.
+        await asyncio.to_thread(append_msgs, new_msgs, max_update_id)
+    return new_msgs, max_update_id
 
 
 async def main():
@@ -334,14 +486,34 @@ async def main():
     print("codex_cbot_telegram Listener")
     print("=" * 50)
 
-    while True:
-        count = await fetch_updates()
-        if count > 0:
-            print(f"[LISTENER] New messages: {count}. Triggering Codex...")
-            data = load_msgs()
-            last_msg = data["messages"][-1] if data["messages"] else {}
-            await trigger_codex(last_msg.get("chat_id"), last_msg.get("text", ""))
-        await asyncio.sleep(0.1)
+    if Bot is None:
+        print("[LISTENER] python-telegram-bot is not installed. Skipping Telegram polling.")
+        return
+    if not BOT_TOKEN or BOT_TOKEN in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
+        print("[LISTENER] BOT_TOKEN not set. Check .env")
+        return
+
+    # get_updates(timeout=30) does the waiting; no sleep between polls.
+    bot = get_bot()
+    last_update_id = load_last_update_id()
+
+    try:
+        while True:
+            try:
+                new_msgs, last_update_id = await fetch_updates(bot, last_update_id)
+            except Exception as e:
+                print(f"[LISTENER] Polling error: {e}")
+                await asyncio.sleep(2)
+                continue
+            if new_msgs:
+                print(f"[LISTENER] New messages: {len(new_msgs)}. Triggering Codex...")
+                last_msg = new_msgs[-1]
+                await trigger_codex(last_msg.get("chat_id"), last_msg.get("text", ""))
+    finally:
+        try:
+            await bot.shutdown()
+        except Exception:
+            pass
 
 
 if __name__ == "__main__":
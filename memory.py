@@ -9,43 +9,111 @@ memory.py:
 
 import os
 import re
+import bisect
 import json
 from datetime import datetime
 
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
 _DIR = os.path.dirname(os.path.abspath(__file__))
 INDEX_FILE = os.path.join(_DIR, "index.json")
 
+# (path, stat signature, parsed index). Re-parsed only when index.json changes on disk,
+# e.g. another process recorded a task; our own saves refresh it in place.
+_INDEX_CACHE = (None, None, None)
+# ((path, stat signature), search tables) built from the cached index by _search_tables().
+_SEARCH_CACHE = (None, None)
+# (instruction, summary, keywords) -> (lowercase content, lowercase keywords). Filled when a task is
+# written, so rebuilding the search tables after update_index only lowers tasks it has not seen.
+_LOWERED = {}
+# (tasks list, {message_id: task}) for the cached index; update_index keeps it in step.
+_TASKS_BY_ID = (None, {})
+
+def _stat_key(path):
+    st = os.stat(path)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
 def load_index():
-    if os.path.exists(INDEX_FILE):
-        try:
-            with open(INDEX_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except: pass
-    return {"tasks": []}
+    global _INDEX_CACHE
+    try:
+        key = _stat_key(INDEX_FILE)
+    except OSError:
+        return {"tasks": []}
+    path, cached_key, cached = _INDEX_CACHE
+    if path == INDEX_FILE and cached_key == key:
+        return cached
+    try:
+        with open(INDEX_FILE, "rb") as f:
+            raw = f.read()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except: return {"tasks": []}
+    _INDEX_CACHE = (INDEX_FILE, key, data)
+    return data
 
 def save_index(data):
-    with open(INDEX_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    global _INDEX_CACHE
+    # Compact on disk; `python -m json.tool index.json` when it needs reading by hand.
+    if orjson is not None:
+        buf = orjson.dumps(data)
+    else:
+        buf = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    tmp = f"{INDEX_FILE}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(buf)
+    os.replace(tmp, INDEX_FILE)
+    try:
+        _INDEX_CACHE = (INDEX_FILE, _stat_key(INDEX_FILE), data)
+    except OSError:
+        _INDEX_CACHE = (None, None, None)
+
+# A str.translate table would need an entry for every non-Hangul codepoint, so the
+# character class stays a regex, compiled once.
+_CLEAN_RE = re.compile(r"[^0-9A-Za-z가-힣]")
+_TOKEN_RE = re.compile(r"[0-9A-Za-z가-힣]{2,}")
 
 def _clean_token(word):
     """구두점·따옴표 제거하여 깨끗한 토큰 반환"""
     # Keep Korean/English letters and digits only for stable multilingual tokenization.
-    return re.sub(r"[^0-9A-Za-z가-힣]", "", word)
+    return _CLEAN_RE.sub("", word)
 
 def _extract_keywords(text):
     """텍스트에서 유의미한 키워드를 추출합니다."""
     # Multilingual keyword extraction: Korean/English words and numbers.
-    tokens = re.findall(r"[0-9A-Za-z가-힣]{2,}", text or "")
-    # 2글자 이상, 중복 제거, 최대 15개
-    seen = set()
-    keywords = []
-    for t in tokens:
-        if t not in seen:
-            seen.add(t)
-            keywords.append(t)
-        if len(keywords) >= 15:
-            break
-    return keywords
+    # 2글자 이상, 중복 제거(순서 유지), 최대 15개
+    return list(dict.fromkeys(_TOKEN_RE.findall(text or "")))[:15]
+
+def _tasks_by_id(tasks):
+    """message_id -> task 매핑 (tasks 리스트가 바뀔 때만 다시 만듭니다)."""
+    global _TASKS_BY_ID
+    indexed, by_id = _TASKS_BY_ID
+    if indexed is not tasks:
+        if any(tasks[i]["timestamp"] < tasks[i + 1]["timestamp"] for i in range(len(tasks) - 1)):
+            tasks.sort(key=lambda x: x["timestamp"], reverse=True)
+        by_id = {}
+        for t in tasks:
+            by_id.setdefault(t["message_id"], t)
+        _TASKS_BY_ID = (tasks, by_id)
+    return by_id
+
+def _insert_pos(tasks, timestamp):
+    """최신순 tasks에서 timestamp 이상인 항목들 바로 뒤의 위치."""
+    lo, hi = 0, len(tasks)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if tasks[mid]["timestamp"] >= timestamp:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def _position_of(tasks, task):
+    i = _insert_pos(tasks, task["timestamp"]) - 1
+    while tasks[i] is not task:
+        i -= 1
+    return i
 
 def update_index(message_id, instruction, result_summary="", files=None):
     """지시사항과 결과를 인덱스에 기록합니다."""
@@ -62,54 +130,105 @@ def update_index(message_id, instruction, result_summary="", files=None):
         "files": files or []
     }
 
-    # 기존 항목 업데이트 또는 새 항목 추가
-    updated = False
-    for i, t in enumerate(index["tasks"]):
-        if t["message_id"] == message_id:
-            index["tasks"][i] = task_entry
-            updated = True
-            break
-
-    if not updated:
-        index["tasks"].append(task_entry)
+    # 기존 항목 업데이트 또는 새 항목 추가 (timestamp 기준 최신순 유지)
+    tasks = index["tasks"]
+    by_id = _tasks_by_id(tasks)
+    previous = by_id.get(message_id)
+    if previous is not None and previous["timestamp"] == task_entry["timestamp"]:
+        tasks[_position_of(tasks, previous)] = task_entry
+    else:
+        if previous is not None:
+            del tasks[_position_of(tasks, previous)]
+        tasks.insert(_insert_pos(tasks, task_entry["timestamp"]), task_entry)
+    by_id[message_id] = task_entry
+    src = _task_source(task_entry)
+    _LOWERED[src] = _lowered_task(task_entry, src)
 
-    # timestamp 기준 최신순 정렬
-    index["tasks"].sort(key=lambda x: x["timestamp"], reverse=True)
     save_index(index)
     return task_entry
 
+def _task_source(task):
+    return (task["instruction"], task["summary"], tuple(task.get("keywords", [])))
+
+def _lowered_task(task, src):
+    cached = _LOWERED.get(src)
+    if cached is None:
+        cached = ((task["instruction"] + " " + task["summary"]).lower(), [k.lower() for k in src[2]])
+    return cached
+
+def _search_tables(index):
+    """키워드 역색인과 소문자 본문 blob을 만들고, 같은 index.json 버전 동안 재사용합니다."""
+    global _SEARCH_CACHE, _LOWERED
+    path, key, cached = _INDEX_CACHE
+    version = (path, key) if cached is index else None
+    if version is not None and _SEARCH_CACHE[0] == version:
+        return _SEARCH_CACHE[1]
+
+    inverted = {}
+    contents = []
+    starts = []
+    lowered = {}
+    pos = 0
+    for i, task in enumerate(index["tasks"]):
+        src = _task_source(task)
+        content, keywords_lower = lowered[src] = _lowered_task(task, src)
+        for k in keywords_lower:
+            ids = inverted.setdefault(k, [])
+            if not ids or ids[-1] != i:
+                ids.append(i)
+        starts.append(pos)
+        contents.append(content)
+        pos += len(content) + 1
+    # Query tokens never contain "\n", so a match in the joined blob never spans two tasks.
+    tables = (inverted, "\n".join(contents), starts, contents)
+    _LOWERED = lowered
+    if version is not None:
+        _SEARCH_CACHE = (version, tables)
+    return tables
+
+def _tasks_containing(blob, starts, needle):
+    """blob 안에서 needle을 포함하는 task 위치를 한 번씩 반환합니다."""
+    found = []
+    off = blob.find(needle)
+    while off != -1:
+        i = bisect.bisect_right(starts, off) - 1
+        found.append(i)
+        if i + 1 >= len(starts):
+            break
+        off = blob.find(needle, starts[i + 1])
+    return found
+
 def search_memory(query):
     """인덱스에서 쿼리와 매칭되는 과거 기록을 검색합니다."""
     index = load_index()
-    query_tokens = [t.lower() for t in re.findall(r"[0-9A-Za-z가-힣]{2,}", query or "")]
-    results = []
+    inverted, blob, starts, contents = _search_tables(index)
+    query_tokens = [t.lower() for t in _TOKEN_RE.findall(query or "")]
+    scores = {}
+
+    # 키워드 완전 일치 (가중치 2)
+    for qt in query_tokens:
+        for i in inverted.get(qt, ()):
+            scores[i] = scores.get(i, 0) + 2
+
+    # instruction + summary 내 포함 (가중치 1)
+    for qt in query_tokens:
+        for i in _tasks_containing(blob, starts, qt):
+            scores[i] = scores.get(i, 0) + 1
 
     # Fallback for edge cases where tokenizer yields nothing (symbols-only input etc.).
     query_fallback = (query or "").strip().lower()
-
-    for task in index["tasks"]:
-        score = 0
-        # 키워드 완전 일치 (가중치 2)
-        task_keywords_lower = [k.lower() for k in task.get("keywords", [])]
-        for qt in query_tokens:
-            if qt in task_keywords_lower:
-                score += 2
-
-        # instruction + summary 내 포함 (가중치 1)
-        content = (task["instruction"] + " " + task["summary"]).lower()
-        for qt in query_tokens:
-            if qt in content:
-                score += 1
-
-        if score == 0 and query_fallback and query_fallback in content:
-            score += 1
-
-        if score > 0:
-            results.append((score, task))
-
-    # 관련성 점수 높은 순으로 반환
-    results.sort(key=lambda x: x[0], reverse=True)
-    return [r[1] for r in results[:5]]
+    if query_fallback:
+        if "\n" in query_fallback:
+            matched = [i for i, content in enumerate(contents) if query_fallback in content]
+        else:
+            matched = _tasks_containing(blob, starts, query_fallback)
+        for i in matched:
+            if i not in scores:
+                scores[i] = 1
+
+    # 관련성 점수 높은 순으로 반환 (동점이면 인덱스 순서)
+    ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+    return [index["tasks"][i] for i, _ in ranked[:5]]
 
 def get_recent_context(limit=3):
     """최근 작업 이력을 반환합니다."""
@@ -0,0 +1,63 @@
+"""
+Readers for the message queue journals.
+
+messages.json is only rewritten when core folds these in, so core, router and the
+web simulator all read them the same way:
+- messages.jsonl: messages listener.py appended that are not folded in yet
+- processed.jsonl: acks from core.mark_as_done that are not compacted yet
+
+Both are JSON Lines; a torn or undecodable line is skipped.
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+
+def _loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _iter_lines(path) -> Iterator[Any]:
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    yield _loads(line)
+                except Exception:
+                    continue
+    except OSError:
+        return
+
+
+def ack_key(msg: Dict[str, Any]) -> Tuple[Any, Any]:
+    """Key acks are journaled and matched under.
+
+    Telegram update ids and web simulator ids come from separate counters, so a
+    message id alone can name two different messages.
+    """
+    return msg.get("chat_id"), msg.get("message_id")
+
+
+def load_acked(path) -> Set[Tuple[Any, Any]]:
+    """Return the ack_key of every message acked in the journal at path."""
+    acked = set()
+    for entry in _iter_lines(path):
+        try:
+            acked.add(ack_key(entry))
+        except Exception:
+            continue
+    return acked
+
+
+def load_inbox(path) -> List[Dict[str, Any]]:
+    """Return the messages appended to the inbox journal at path, oldest first."""
+    return [m for m in _iter_lines(path) if isinstance(m, dict)]
+
+
+def is_pending(msg: Dict[str, Any], acked: Set[Tuple[Any, Any]]) -> bool:
+    return not msg.get("processed") and ack_key(msg) not in acked
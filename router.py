@@ -7,14 +7,30 @@ and outputs shell-friendly env vars for executor.sh.
 """
 
 import argparse
+import bisect
+import functools
 import json
 import os
 import re
 import shlex
-from typing import Dict, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+try:
+    import ahocorasick
+except Exception:  # pragma: no cover
+    ahocorasick = None  # type: ignore
+
+import queue_journal
 
 _DIR = os.path.dirname(os.path.abspath(__file__))
 MESSAGES_FILE = os.path.join(_DIR, "messages.json")
+PROCESSED_LOG = os.path.join(_DIR, "processed.jsonl")
+INBOX_LOG = os.path.join(_DIR, "messages.jsonl")
 
 
 WEB_KEYWORDS = [
@@ -52,38 +68,126 @@ STYLE_KEYWORDS = {
 }
 
 
-def load_messages() -> Dict:
-    if not os.path.exists(MESSAGES_FILE):
-        return {"messages": [], "last_update_id": 0}
+def _loads(raw: bytes):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def iter_queue_messages() -> Iterator[Dict]:
+    """Yield messages.json "messages" entries in queue order from a single orjson/json parse."""
     try:
-        with open(MESSAGES_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(MESSAGES_FILE, "rb") as f:
+            data = _loads(f.read())
     except Exception:
-        return {"messages": [], "last_update_id": 0}
+        return
+    if isinstance(data, dict):
+        yield from data.get("messages") or []
+
+
+def pending_messages() -> List[Dict]:
+    """Every unprocessed message, messages.json first and then the inbox journal."""
+    acked = queue_journal.load_acked(PROCESSED_LOG)
+    return [
+        m
+        for source in (iter_queue_messages(), queue_journal.load_inbox(INBOX_LOG))
+        for m in source
+        if queue_journal.is_pending(m, acked)
+    ]
 
 
 def first_unprocessed_message() -> Dict:
-    data = load_messages()
-    for msg in data.get("messages", []):
-        if not msg.get("processed"):
-            return msg
-    return {}
+    acked = queue_journal.load_acked(PROCESSED_LOG)
+
+    def first_pending(messages):
+        return next((m for m in messages if queue_journal.is_pending(m, acked)), None)
+
+    # The inbox journal is only read when messages.json has nothing pending.
+    return first_pending(iter_queue_messages()) or first_pending(queue_journal.load_inbox(INBOX_LOG)) or {}
+
+
+ICON_KEYWORDS = ["아이콘", "icon", "로고", "logo"]
+
+
+def _keyword_tags() -> Dict[str, List]:
+    """keyword -> one tag per list it appears in, so per-tag counts match per-list scans."""
+    tags: Dict[str, List] = {}
+    lists = [
+        ("web", WEB_KEYWORDS),
+        ("image", IMAGE_KEYWORDS),
+        ("web_strong", WEB_STRONG),
+        ("image_strong", IMAGE_STRONG),
+        ("icon", ICON_KEYWORDS),
+    ]
+    lists += [(("domain", d), words) for d, words in DOMAIN_KEYWORDS.items()]
+    lists += [(("style", s), words) for s, words in STYLE_KEYWORDS.items()]
+    for tag, words in lists:
+        for w in words:
+            tags.setdefault(w.lower(), []).append(tag)
+    return tags
+
+
+_KEYWORD_TAGS = _keyword_tags()
+
+if ahocorasick is not None:
+    _AUTOMATON = ahocorasick.Automaton()
+    for _kw in _KEYWORD_TAGS:
+        _AUTOMATON.add_word(_kw, _kw)
+    _AUTOMATON.make_automaton()
+else:
+    _AUTOMATON = None
+
+# First level of a keyword trie: only keywords whose first character occurs in the
+# text need a substring check. Walking the full trie per character in Python is
+# slower than the C substring search for anything but very short instructions.
+_KEYWORDS_BY_FIRST_CHAR: Dict[str, List[str]] = {}
+for _kw in _KEYWORD_TAGS:
+    _KEYWORDS_BY_FIRST_CHAR.setdefault(_kw[0], []).append(_kw)
+
+
+def _matched_keywords(text: str) -> Set[str]:
+    """Distinct keywords occurring in text (substring semantics, overlaps included)."""
+    if _AUTOMATON is not None:
+        return {kw for _, kw in _AUTOMATON.iter(text)}
+    return {
+        kw
+        for ch in _KEYWORDS_BY_FIRST_CHAR.keys() & set(text)
+        for kw in _KEYWORDS_BY_FIRST_CHAR[ch]
+        if kw in text
+    }
 
 
-def _contains_any(text: str, words) -> bool:
-    return any(w in text for w in words)
+def _matched_keywords_batch(texts: List[str]) -> List[Set[str]]:
+    """_matched_keywords for many normalized texts; one automaton pass over all of them when available."""
+    if _AUTOMATON is None:
+        return [_matched_keywords(text) for text in texts]
+    # Keywords never contain the separator, so no hit spans two texts.
+    starts = []
+    pos = 0
+    for text in texts:
+        starts.append(pos)
+        pos += len(text) + 1
+    matched: List[Set[str]] = [set() for _ in texts]
+    for end, kw in _AUTOMATON.iter("\x01".join(texts)):
+        matched[bisect.bisect_right(starts, end) - 1].add(kw)
+    return matched
 
 
-def detect_task_type(instruction: str) -> Tuple[str, str, float]:
-    text = (instruction or "").strip().lower()
-    if not text:
-        return "general", "empty_instruction", 0.0
+def _tag_counts(text: str) -> Dict:
+    return _counts_from_keywords(_matched_keywords(text))
 
-    has_web = _contains_any(text, WEB_KEYWORDS)
-    has_image = _contains_any(text, IMAGE_KEYWORDS)
 
-    web_score = sum(1 for w in WEB_KEYWORDS if w in text)
-    image_score = sum(1 for w in IMAGE_KEYWORDS if w in text)
+def _counts_from_keywords(matched: Set[str]) -> Dict:
+    counts: Dict = {}
+    for kw in matched:
+        for tag in _KEYWORD_TAGS[kw]:
+            counts[tag] = counts.get(tag, 0) + 1
+    return counts
+
+
+def _task_type_from_counts(counts: Dict) -> Tuple[str, str, float]:
+    web_score = counts.get("web", 0)
+    image_score = counts.get("image", 0)
+    has_web = web_score > 0
+    has_image = image_score > 0
 
     if has_web and not has_image:
         conf = min(0.99, 0.60 + (web_score * 0.05))
@@ -95,10 +199,10 @@ def detect_task_type(instruction: str) -> Tuple[str, str, float]:
     if has_web and has_image:
         # In mixed cases prioritize deliverable semantics:
         # if page-like words are present, route to web page generation.
-        if _contains_any(text, WEB_STRONG) and not _contains_any(text, ["아이콘", "icon", "로고", "logo"]):
+        if counts.get("web_strong") and not counts.get("icon"):
             conf = min(0.95, 0.58 + (web_score * 0.04))
             return "web_page", "mixed_keywords_pref_web", conf
-        if _contains_any(text, IMAGE_STRONG):
+        if counts.get("image_strong"):
             conf = min(0.95, 0.58 + (image_score * 0.04))
             return "image_asset", "mixed_keywords_pref_image", conf
         return "web_page", "mixed_keywords_default_web", 0.62
@@ -106,15 +210,11 @@ def detect_task_type(instruction: str) -> Tuple[str, str, float]:
     return "general", "no_route_keyword", 0.35
 
 
-def detect_domain(instruction: str) -> Tuple[str, str, float]:
-    text = (instruction or "").strip().lower()
-    if not text:
-        return "general", "empty_instruction", 0.0
-
+def _domain_from_counts(counts: Dict) -> Tuple[str, str, float]:
     best_domain = "general"
     best_score = 0
-    for domain, words in DOMAIN_KEYWORDS.items():
-        score = sum(1 for w in words if w in text)
+    for domain in DOMAIN_KEYWORDS:
+        score = counts.get(("domain", domain), 0)
         if score > best_score:
             best_domain = domain
             best_score = score
@@ -126,14 +226,51 @@ def detect_domain(instruction: str) -> Tuple[str, str, float]:
     return best_domain, "domain_keywords_detected", conf
 
 
-def detect_style(instruction: str) -> str:
-    text = (instruction or "").strip().lower()
-    for style, words in STYLE_KEYWORDS.items():
-        if _contains_any(text, words):
+def _style_from_counts(counts: Dict) -> str:
+    for style in STYLE_KEYWORDS:
+        if counts.get(("style", style)):
             return style
     return "auto"
 
 
+def classify(instruction: str) -> Tuple[Tuple[str, str, float], Tuple[str, str, float], str]:
+    """Task type, domain and style from a single keyword pass over the instruction."""
+    return _classify_normalized((instruction or "").strip().lower())
+
+
+@functools.lru_cache(maxsize=1024)
+def _classify_normalized(text: str) -> Tuple[Tuple[str, str, float], Tuple[str, str, float], str]:
+    # Replays, retries and smoke runs route the same brief repeatedly.
+    if not text:
+        return _EMPTY_CLASSIFICATION
+    return _classification(_tag_counts(text))
+
+
+_EMPTY_CLASSIFICATION = (("general", "empty_instruction", 0.0), ("general", "empty_instruction", 0.0), "auto")
+
+
+def _classification(counts: Dict) -> Tuple[Tuple[str, str, float], Tuple[str, str, float], str]:
+    return _task_type_from_counts(counts), _domain_from_counts(counts), _style_from_counts(counts)
+
+
+def detect_task_type(instruction: str) -> Tuple[str, str, float]:
+    return classify(instruction)[0]
+
+
+def detect_domain(instruction: str) -> Tuple[str, str, float]:
+    return classify(instruction)[1]
+
+
+_STYLE_FIRST_CHARS = frozenset(w[0].lower() for words in STYLE_KEYWORDS.values() for w in words)
+
+
+def detect_style(instruction: str) -> str:
+    # Most instructions name no style; rule them out without a keyword pass.
+    if _STYLE_FIRST_CHARS.isdisjoint((instruction or "").lower()):
+        return "auto"
+    return classify(instruction)[2]
+
+
 def map_task_to_route(task_type: str) -> str:
     if task_type == "web_page":
         return "web_master"
@@ -142,12 +279,16 @@ def map_task_to_route(task_type: str) -> str:
     return "codex_general"
 
 
+_SLUG_RE = re.compile(r"[^a-zA-Z0-9]+")
+
+
+@functools.lru_cache(maxsize=1024)
 def slugify(text: str, max_len: int = 40) -> str:
-    slug = re.sub(r"[^a-zA-Z0-9]+", "-", text).strip("-").lower()
+    slug = _SLUG_RE.sub("-", text).strip("-").lower()
     return slug[:max_len] or "project"
 
 
-def build_route_payload(msg: Dict) -> Dict[str, str]:
+def build_route_payload(msg: Dict, classification: Optional[Tuple] = None) -> Dict[str, str]:
     if not msg:
         return {
             "HAS_TASK": "0",
@@ -166,9 +307,10 @@ def build_route_payload(msg: Dict) -> Dict[str, str]:
         }
 
     instruction = (msg.get("text") or "").strip()
-    task_type, reason, task_conf = detect_task_type(instruction)
-    domain_hint, _, domain_conf = detect_domain(instruction)
-    style_hint = detect_style(instruction)
+    if classification is None:
+        # instruction is already stripped; lowercase it once for the cached classifier.
+        classification = _classify_normalized(instruction.lower())
+    (task_type, reason, task_conf), (domain_hint, _, domain_conf), style_hint = classification
     route = map_task_to_route(task_type)
     message_id = str(msg.get("message_id", ""))
 
@@ -194,6 +336,16 @@ def build_route_payload(msg: Dict) -> Dict[str, str]:
     }
 
 
+def batch_route_payloads(msgs: List[Dict]) -> List[Dict[str, str]]:
+    """Route payloads for many messages, matching keywords for all of them in one pass."""
+    texts = [(m.get("text") or "").strip().lower() for m in msgs]
+    payloads = []
+    for msg, text, matched in zip(msgs, texts, _matched_keywords_batch(texts)):
+        classification = _classification(_counts_from_keywords(matched)) if text else _EMPTY_CLASSIFICATION
+        payloads.append(build_route_payload(msg, classification))
+    return payloads
+
+
 def print_env(payload: Dict[str, str]) -> None:
     for key, value in payload.items():
         print(f"{key}={shlex.quote(str(value))}")
@@ -204,12 +356,18 @@ def main() -> None:
     parser.add_argument("--format", choices=["env", "json"], default="env")
     parser.add_argument("--text", help="Optional direct text for dry-run routing")
     parser.add_argument("--message-id", default="0", help="Optional message id for --text mode")
+    parser.add_argument("--batch", action="store_true", help="Route every unprocessed message (json format only)")
     args = parser.parse_args()
 
+    if args.batch:
+        if args.format != "json":
+            parser.error("--batch requires --format json")
+        print(json.dumps(batch_route_payloads(pending_messages()), ensure_ascii=False))
+        return
+
     if args.text is not None:
-        task_type, reason, task_conf = detect_task_type(args.text)
-        domain_hint, _, domain_conf = detect_domain(args.text)
-        style_hint = detect_style(args.text)
+        instruction = args.text.strip()
+        (task_type, reason, task_conf), (domain_hint, _, domain_conf), style_hint = _classify_normalized(instruction.lower())
         route = map_task_to_route(task_type)
         payload = {
             "HAS_TASK": "1",
@@ -218,7 +376,7 @@ def main() -> None:
             "MESSAGE_ID": str(args.message_id),
             "CHAT_ID": "",
             "PROJECT_NAME": f"msg-{args.message_id}-{domain_hint if domain_hint != 'general' else 'project'}-{slugify(args.text)}",
-            "INSTRUCTION": args.text.strip(),
+            "INSTRUCTION": instruction,
             "TASK_TYPE": task_type,
             "TASK_CONFIDENCE": f"{task_conf:.2f}",
             "DOMAIN_HINT": domain_hint,
@@ -11,10 +11,18 @@ Scope (intentionally narrow):
 import argparse
 import json
 import os
+import re
 import subprocess
 import sys
+import threading
 import time
 from pathlib import Path
+from typing import Set
+
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
 
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -26,17 +34,57 @@ def _now_tag() -> str:
     return time.strftime("%Y%m%d_%H%M%S")
 
 
-def _classify_failure(combined_log: str, returncode: int) -> str:
-    text = (combined_log or "").lower()
-    if "sandbox: read-only" in text or "blocked by policy" in text:
-        return "FAIL_POLICY_READ_ONLY"
-    if "photorealistic asset generation failed in strict mode" in text:
-        return "FAIL_STRICT_REALISM"
+# (lowercase signature, status); earlier entries win. Signatures never span lines.
+_FAILURE_SIGNATURES = (
+    ("sandbox: read-only", "FAIL_POLICY_READ_ONLY"),
+    ("blocked by policy", "FAIL_POLICY_READ_ONLY"),
+    ("photorealistic asset generation failed in strict mode", "FAIL_STRICT_REALISM"),
+)
+
+
+_SIGNATURE_STATUS = dict(_FAILURE_SIGNATURES)
+# One case-insensitive pass instead of lowercasing the text and scanning once per signature.
+_SIGNATURE_RE = re.compile("|".join(re.escape(sig) for sig, _ in _FAILURE_SIGNATURES), re.IGNORECASE)
+
+
+def _signature_hits(text: str) -> Set[str]:
+    return {_SIGNATURE_STATUS[m.lower()] for m in _SIGNATURE_RE.findall(text)}
+
+
+def _failure_from_hits(hits: Set[str], returncode: int) -> str:
+    for _, status in _FAILURE_SIGNATURES:
+        if status in hits:
+            return status
     if returncode == 124:
         return "FAIL_TIMEOUT"
     return "FAIL_EXEC"
 
 
+def _classify_failure(combined_log: str, returncode: int) -> str:
+    return _failure_from_hits(_signature_hits(combined_log or ""), returncode)
+
+
+def _size_ok(path: Path, min_bytes: int) -> bool:
+    # One stat() instead of exists() followed by stat().
+    try:
+        return os.stat(path).st_size >= min_bytes
+    except OSError:
+        return False
+
+
+def _stream_output(
+    proc: subprocess.Popen, log_file, hits: Set[str], stop: threading.Event, lock: threading.Lock
+) -> None:
+    """Copy orchestrator output to the log as it arrives, noting failure signatures per line."""
+    for line in proc.stdout:
+        # main() sets stop under the same lock before it closes log_file.
+        with lock:
+            if stop.is_set():
+                return
+            log_file.write(line)
+            hits.update(_signature_hits(line))
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Strict photoreal smoke runner")
     parser.add_argument("--project", default=f"live-test-shoppingmall-real-{_now_tag()}")
@@ -51,10 +99,12 @@ def main() -> int:
     log_path = TEST_RUNS / f"realism_smoke_{stamp}.log"
     report_path = TEST_RUNS / f"realism_smoke_{stamp}.json"
 
-    env = os.environ.copy()
-    env["IMAGE_GEN_PROVIDER"] = "codex_cli"
-    env["STRICT_REALISTIC_ASSETS"] = "1"
-    env.setdefault("CODEX_IMAGE_TIMEOUT", "300")
+    env = {
+        "CODEX_IMAGE_TIMEOUT": "300",
+        **os.environ,
+        "IMAGE_GEN_PROVIDER": "codex_cli",
+        "STRICT_REALISTIC_ASSETS": "1",
+    }
 
     cmd = [
         sys.executable,
@@ -66,37 +116,46 @@ def main() -> int:
     ]
 
     started = time.time()
-    try:
-        result = subprocess.run(
+    hits: Set[str] = set()
+    with log_path.open("w", encoding="utf-8", errors="replace") as log_file:
+        proc = subprocess.Popen(
             cmd,
             cwd=str(ROOT),
             env=env,
-            capture_output=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
             encoding="utf-8",
             errors="replace",
-            timeout=args.timeout,
+            bufsize=1,
         )
-        rc = result.returncode
-        stdout = result.stdout or ""
-        stderr = result.stderr or ""
-    except subprocess.TimeoutExpired as exc:
-        rc = 124
-        stdout = (exc.stdout or "") if isinstance(exc.stdout, str) else ""
-        stderr = (exc.stderr or "") if isinstance(exc.stderr, str) else ""
+        stop = threading.Event()
+        lock = threading.Lock()
+        reader = threading.Thread(target=_stream_output, args=(proc, log_file, hits, stop, lock), daemon=True)
+        reader.start()
+        try:
+            rc = proc.wait(timeout=args.timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            rc = 124
+        # Grandchildren can keep the pipe open after a kill; don't wait on them forever.
+        reader.join(timeout=10)
+        if reader.is_alive():
+            # Detach the still-blocked reader so it never writes to the file closed below.
+            with lock:
+                stop.set()
 
     elapsed = round(time.time() - started, 2)
-    combined = (stdout + "\n" + stderr).strip()
-    log_path.write_text(combined, encoding="utf-8", errors="replace")
 
     project_dir = ROOT / "web_projects" / args.project
     hero = project_dir / "assets" / "hero_bg.png"
     product = project_dir / "assets" / "product_feature.png"
 
-    hero_ok = hero.exists() and hero.stat().st_size >= args.min_bytes
-    product_ok = product.exists() and product.stat().st_size >= args.min_bytes
+    hero_ok = _size_ok(hero, args.min_bytes)
+    product_ok = _size_ok(product, args.min_bytes)
 
-    status = "PASS" if (rc == 0 and hero_ok and product_ok) else _classify_failure(combined, rc)
+    status = "PASS" if (rc == 0 and hero_ok and product_ok) else _failure_from_hits(hits, rc)
 
     report = {
         "status": status,
@@ -122,7 +181,10 @@ def main() -> int:
             "min_bytes": args.min_bytes,
         },
     }
-    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if orjson is not None:
+        report_path.write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    else:
+        report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
 
     print(f"STATUS: {status}")
     print(f"RETURNCODE: {rc}")
@@ -11,6 +11,7 @@ Features:
 
 import argparse
 import curses
+import http.client
 import json
 import os
 import subprocess
@@ -21,7 +22,12 @@ import urllib.request
 from collections import deque
 from datetime import datetime
 from pathlib import Path
-from typing import Deque, Dict, Optional
+from typing import Deque, Dict, Optional, Tuple
+
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
 
 
 class ServerController:
@@ -42,8 +48,13 @@ class ServerController:
         self.use_reload = use_reload
         self.process: Optional[subprocess.Popen] = None
         self.started_at: Optional[float] = None
+        # Appended by the reader thread, read by the render loop. Copying a deque while another
+        # thread appends can raise "deque mutated during iteration", so both take _log_lock.
         self.log_lines: Deque[str] = deque(maxlen=250)
-        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        # Bumped on every append; the deque length stops changing once it is full. Read without
+        # the lock: a stale int only delays one redraw.
+        self.log_version = 0
         self._reader_thread: Optional[threading.Thread] = None
         self.last_exit_code: Optional[int] = None
         self.last_error: str = ""
@@ -65,8 +76,10 @@ class ServerController:
 
     def _append_log(self, line: str) -> None:
         ts = datetime.now().strftime("%H:%M:%S")
-        with self._lock:
-            self.log_lines.append(f"[{ts}] {line.rstrip()}")
+        entry = f"[{ts}] {line.rstrip()}"
+        with self._log_lock:
+            self.log_lines.append(entry)
+            self.log_version += 1
 
     def _reader(self) -> None:
         proc = self.process
@@ -82,9 +95,7 @@ class ServerController:
         if self.is_running():
             return False
 
-        env = os.environ.copy()
-        env.setdefault("MESSAGE_CHANNEL", "webmock")
-        env.setdefault("RUN_MODE", "webmock")
+        env = {"MESSAGE_CHANNEL": "webmock", "RUN_MODE": "webmock", **os.environ}
 
         try:
             self.process = subprocess.Popen(
@@ -147,20 +158,50 @@ class ServerController:
         return f"{sec // 60:02d}:{sec % 60:02d}"
 
     def get_logs(self, max_lines: int) -> list:
-        with self._lock:
-            if max_lines <= 0:
-                return []
-            return list(self.log_lines)[-max_lines:]
+        if max_lines <= 0:
+            return []
+        with self._log_lock:
+            snapshot = list(self.log_lines)
+        return snapshot[-max_lines:]
 
 
-def fetch_status(host: str, port: int, timeout: float = 1.5) -> Dict[str, object]:
-    url = f"http://{host}:{port}/api/status"
-    try:
-        with urllib.request.urlopen(url, timeout=timeout) as resp:
-            payload = json.loads(resp.read().decode("utf-8"))
-        return {"ok": True, "payload": payload}
-    except Exception as exc:
-        return {"ok": False, "error": str(exc)}
+class StatusPoller:
+    """Polls /api/status over one keep-alive connection, revalidating with the last ETag."""
+
+    def __init__(self, host: str, port: int, timeout: float = 1.5) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._etag = ""
+        self._last: Dict[str, object] = {}
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def fetch(self) -> Dict[str, object]:
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        try:
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._conn.request("GET", "/api/status", headers=headers)
+            resp = self._conn.getresponse()
+            body = resp.read()
+            if resp.status == 304:
+                return self._last
+            if resp.status != 200:
+                raise OSError(f"HTTP Error {resp.status}: {resp.reason}")
+            self._etag = resp.getheader("ETag", "")
+            payload = orjson.loads(body) if orjson is not None else json.loads(body.decode("utf-8"))
+            self._last = {"ok": True, "payload": payload}
+        except Exception as exc:
+            # Server restarts drop the connection; reconnect on the next poll.
+            self._close()
+            self._etag = ""
+            self._last = {"ok": False, "error": str(exc)}
+        return self._last
 
 
 def send_test_message(host: str, port: int) -> str:
@@ -184,49 +225,69 @@ def send_test_message(host: str, port: int) -> str:
         return f"Send failed: {exc}"
 
 
-def render(stdscr, controller: ServerController, health: Dict[str, object], last_action: str) -> None:
-    stdscr.erase()
-    max_y, max_x = stdscr.getmaxyx()
-
+def _frame_rows(controller: ServerController, health: Dict[str, object], last_action: str, max_y: int) -> Dict[int, Tuple[Optional[str], int]]:
+    """row -> (text, attr) for one frame; text None draws the separator line."""
     status = "RUNNING" if controller.is_running() else "STOPPED"
-    stdscr.addnstr(0, 0, "Web Simulator TUI", max_x - 1, curses.A_BOLD)
-    stdscr.addnstr(
-        1,
-        0,
-        f"Server: {status}  PID: {controller.process.pid if controller.process else '-'}  Uptime: {controller.uptime()}",
-        max_x - 1,
-    )
-    stdscr.addnstr(2, 0, f"Target: http://{controller.host}:{controller.port}", max_x - 1)
+    rows: Dict[int, Tuple[Optional[str], int]] = {
+        0: ("Web Simulator TUI", curses.A_BOLD),
+        1: (f"Server: {status}  PID: {controller.process.pid if controller.process else '-'}  Uptime: {controller.uptime()}", 0),
+        2: (f"Target: http://{controller.host}:{controller.port}", 0),
+    }
 
     if health.get("ok"):
         payload = health.get("payload", {})
         pending = payload.get("pending_count", "?")
         running = payload.get("executor_running", "?")
         ids = payload.get("pending_ids", [])
-        stdscr.addnstr(4, 0, f"API: OK  pending={pending}  executor_running={running}", max_x - 1)
-        stdscr.addnstr(5, 0, f"Pending IDs: {ids}", max_x - 1)
+        rows[4] = (f"API: OK  pending={pending}  executor_running={running}", 0)
+        rows[5] = (f"Pending IDs: {ids}", 0)
     else:
-        stdscr.addnstr(4, 0, f"API: ERROR  {health.get('error', '-')}", max_x - 1, curses.A_BOLD)
+        rows[4] = (f"API: ERROR  {health.get('error', '-')}", curses.A_BOLD)
 
-    stdscr.addnstr(
-        7,
-        0,
-        "Keys: [s] start  [x] stop  [r] restart  [t] send test message  [q] quit",
-        max_x - 1,
-    )
-    stdscr.addnstr(8, 0, f"Last action: {last_action}", max_x - 1)
-    stdscr.hline(9, 0, ord("-"), max_x)
+    rows[7] = ("Keys: [s] start  [x] stop  [r] restart  [t] send test message  [q] quit", 0)
+    rows[8] = (f"Last action: {last_action}", 0)
+    rows[9] = (None, 0)
 
     available = max_y - 11
     logs = controller.get_logs(max(0, available))
-    stdscr.addnstr(10, 0, "Server Logs:", max_x - 1, curses.A_BOLD)
+    rows[10] = ("Server Logs:", curses.A_BOLD)
     for i, line in enumerate(logs):
         row = 11 + i
         if row >= max_y:
             break
-        stdscr.addnstr(row, 0, line, max_x - 1)
+        rows[row] = (line, 0)
+    return rows
+
+
+def render(stdscr, controller: ServerController, health: Dict[str, object], last_action: str, previous: Optional[Tuple] = None) -> Tuple:
+    """Draw only the rows that differ from the previous frame; returns this frame for the next call."""
+    max_y, max_x = stdscr.getmaxyx()
+    rows = _frame_rows(controller, health, last_action, max_y)
+
+    prev_size, prev_rows = previous if previous else (None, {})
+    if prev_size != (max_y, max_x):
+        stdscr.erase()
+        prev_rows = {}
+
+    changed = False
+    for row in prev_rows.keys() - rows.keys():
+        stdscr.move(row, 0)
+        stdscr.clrtoeol()
+        changed = True
+    for row, (text, attr) in rows.items():
+        if prev_rows.get(row) == (text, attr):
+            continue
+        stdscr.move(row, 0)
+        stdscr.clrtoeol()
+        if text is None:
+            stdscr.hline(row, 0, ord("-"), max_x)
+        else:
+            stdscr.addnstr(row, 0, text, max_x - 1, attr)
+        changed = True
 
-    stdscr.refresh()
+    if changed:
+        stdscr.refresh()
+    return (max_y, max_x), rows
 
 
 def run_tui(stdscr, controller: ServerController, auto_start: bool) -> None:
@@ -240,15 +301,29 @@ def run_tui(stdscr, controller: ServerController, auto_start: bool) -> None:
     last_action = "Ready"
     last_health_at = 0.0
     health: Dict[str, object] = {"ok": False, "error": "not polled yet"}
+    poller = StatusPoller(controller.host, controller.port)
+    frame = None
+    drawn_state = None
 
     while True:
         controller.poll()
         now = time.time()
         if now - last_health_at > 1.0:
-            health = fetch_status(controller.host, controller.port)
+            health = poller.fetch()
             last_health_at = now
 
-        render(stdscr, controller, health, last_action)
+        state = (
+            controller.log_version,
+            controller.is_running(),
+            controller.process.pid if controller.process else None,
+            controller.uptime(),
+            health,
+            last_action,
+            stdscr.getmaxyx(),
+        )
+        if state != drawn_state:
+            frame = render(stdscr, controller, health, last_action, frame)
+            drawn_state = state
         key = stdscr.getch()
         if key < 0:
             continue
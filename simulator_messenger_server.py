@@ -1,11 +1,16 @@
+import atexit
+import bisect
+import functools
 import json
 import os
+import queue
+import select
 import subprocess
 import hashlib
 import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import quote
 from contextlib import contextmanager
 
@@ -14,13 +19,22 @@ try:
 except Exception:  # pragma: no cover
     fcntl = None  # type: ignore
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
+import queue_journal
+
 ROOT = Path(__file__).resolve().parent
 MESSAGES_FILE = ROOT / "messages.json"
+PROCESSED_LOG = ROOT / "processed.jsonl"
+INBOX_LOG = ROOT / "messages.jsonl"
 WORKING_FILE = ROOT / "working.json"
 OUTBOX_FILE = ROOT / "web_outbox.json"
 HISTORY_FILE = ROOT / "web_chat_history.json"
@@ -30,6 +44,10 @@ WEB_DIR = ROOT / "web_simulator"
 
 _ACTIVE_PROCESS = None
 _PROCESS_LOCK = threading.Lock()
+# (source file signature, timeline) from the last _to_timeline() that read the files.
+_TIMELINE_CACHE = (None, None)
+# (cached timeline list, response body, ETag) for GET /api/messages, rebuilt when _to_timeline() rebuilds.
+_TIMELINE_BODY = (None, b"", "")
 
 
 class IncomingMessage(BaseModel):
@@ -44,49 +62,98 @@ class QuickTestMessage(BaseModel):
     user: str = "Web Control"
 
 
-def _load_json(path: Path, default: Dict[str, Any]) -> Dict[str, Any]:
-    if path.exists():
+def _loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _dumps(data: Any) -> bytes:
+    if orjson is not None:
         try:
-            with path.open("r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return default
-    return default
+            return orjson.dumps(data)
+        except TypeError:  # ints beyond 64 bits and the like; stdlib json copes
+            pass
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _load_json(path: Path, default: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return _loads(path.read_bytes())
+    except Exception:
+        return default
+
+
+_INPROC_LOCKS: Dict[str, threading.Lock] = {}
+# Lock-file descriptors opened once per path and kept for the life of the server.
+_LOCK_FDS: Dict[str, int] = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+def _lock_slot(path: Path):
+    key = f"{path}.lock"
+    lock = _INPROC_LOCKS.get(key)
+    if lock is None:
+        with _LOCKS_GUARD:
+            lock = _INPROC_LOCKS.setdefault(key, threading.Lock())
+    return key, lock
 
 
 @contextmanager
 def _file_lock(path: Path):
-    lock_path = Path(f"{path}.lock")
-    lock_path.parent.mkdir(parents=True, exist_ok=True)
-    with lock_path.open("a+", encoding="utf-8") as lock_file:
-        if fcntl is not None:
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+    # flock is per open file description, so a shared fd does not exclude this process's own
+    # request threads; they queue on the in-memory lock and flock only guards other processes.
+    key, lock = _lock_slot(path)
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        fd = _LOCK_FDS.get(key)
+        if fd is None:
+            Path(key).parent.mkdir(parents=True, exist_ok=True)
+            fd = _LOCK_FDS[key] = os.open(key, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
         try:
             yield
         finally:
-            if fcntl is not None:
-                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            fcntl.flock(fd, fcntl.LOCK_UN)
 
 
 def _save_json(path: Path, data: Dict[str, Any]) -> None:
+    # Write-then-rename with no fsync: readers in other processes (core, the TUI) never see a
+    # half-written file, and HISTORY_FILE outlives source resets, so it is not rewritten in place.
+    buf = _dumps(data)
     tmp = path.with_suffix(path.suffix + ".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp.write_bytes(buf)
     tmp.replace(path)
 
 
-def _next_message_id(messages: List[Dict[str, Any]]) -> int:
-    numeric_ids = []
-    for m in messages:
+def _load_queue() -> List[Dict[str, Any]]:
+    messages = _load_json(MESSAGES_FILE, {"messages": [], "last_update_id": 0}).get("messages", [])
+    messages = messages + queue_journal.load_inbox(INBOX_LOG)
+    acked = queue_journal.load_acked(PROCESSED_LOG)
+    if acked:
+        messages = [dict(m, processed=True) if queue_journal.ack_key(m) in acked else m for m in messages]
+    return messages
+
+
+def _next_message_id(data: Dict[str, Any]) -> int:
+    # data["next_message_id"] caches the answer as of data["next_message_id_scanned"] messages.
+    # The queue is only ever extended (here and by core's inbox fold), so just the messages
+    # appended since then need looking at.
+    messages = data.get("messages", [])
+    next_id = data.get("next_message_id")
+    start = data.get("next_message_id_scanned")
+    if not isinstance(next_id, int) or not isinstance(start, int) or start > len(messages):
+        next_id, start = 1, 0
+    for m in messages[start:]:
         try:
-            numeric_ids.append(int(m.get("message_id", 0)))
+            next_id = max(next_id, int(m.get("message_id", 0)) + 1)
         except Exception:
             continue
-    return (max(numeric_ids) + 1) if numeric_ids else 1
+    return next_id
 
 
 def _has_pending_messages() -> bool:
-    queued = _load_json(MESSAGES_FILE, {"messages": [], "last_update_id": 0}).get("messages", [])
+    queued = _load_queue()
     return any(not m.get("processed") for m in queued)
 
 
@@ -138,6 +205,33 @@ def _trigger_executor() -> Dict[str, Any]:
         return _spawn_executor_locked()
 
 
+def _wait_exit(proc: subprocess.Popen, timeout: float) -> bool:
+    """Wait up to timeout for proc to exit without reaping it; _watch_executor does the reaping."""
+    if proc.poll() is not None:
+        return True
+    # _watch_executor blocks in proc.wait() holding Popen's waitpid lock, which turns
+    # proc.wait(timeout) here into a sleep/poll loop. A pidfd becomes readable on exit instead.
+    pidfd_open = getattr(os, "pidfd_open", None)
+    if pidfd_open is not None:
+        try:
+            fd = pidfd_open(proc.pid)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            fd = None
+        if fd is not None:
+            try:
+                ready, _, _ = select.select([fd], [], [], timeout)
+            finally:
+                os.close(fd)
+            return bool(ready)
+    try:
+        proc.wait(timeout=timeout)
+        return True
+    except subprocess.TimeoutExpired:
+        return False
+
+
 def _stop_executor() -> Dict[str, Any]:
     global _ACTIVE_PROCESS
 
@@ -150,10 +244,9 @@ def _stop_executor() -> Dict[str, Any]:
     pid = proc.pid
     try:
         proc.terminate()
-        proc.wait(timeout=4)
-    except subprocess.TimeoutExpired:
-        proc.kill()
-        proc.wait(timeout=2)
+        if not _wait_exit(proc, 4):
+            proc.kill()
+            _wait_exit(proc, 2)
     except Exception as exc:
         return {"ok": False, "stopped": False, "error": str(exc), "pid": pid}
 
@@ -163,19 +256,86 @@ def _stop_executor() -> Dict[str, Any]:
     return {"ok": True, "stopped": True, "pid": pid}
 
 
+def _tail_from(f, end: int, lines: int) -> List[str]:
+    """The last `lines` lines of the open log before byte offset `end`."""
+    start = end
+    block = 8192
+    buf = b""
+    # Read backwards until the chunk holds more than `lines` newlines (or the whole file).
+    while start > 0 and (lines <= 0 or buf.count(b"\n") <= lines):
+        step = min(block, start)
+        start -= step
+        f.seek(start)
+        buf = f.read(step) + buf
+        block *= 2
+    if start > 0:
+        # Drop the partial first line; b"\n" never occurs inside a UTF-8 sequence.
+        buf = buf[buf.index(b"\n") + 1:]
+    return buf.decode("utf-8", errors="replace").splitlines()[-lines:]
+
+
 def _tail_log(lines: int = 40) -> List[str]:
-    if not EXEC_LOG.exists():
-        return []
     try:
-        with EXEC_LOG.open("r", encoding="utf-8", errors="replace") as f:
-            return f.read().splitlines()[-lines:]
+        with EXEC_LOG.open("rb") as f:
+            return _tail_from(f, f.seek(0, os.SEEK_END), lines)
     except Exception:
         return []
 
 
+# Clients further behind than this get a fresh tail instead of the whole backlog.
+LOG_CHUNK_LIMIT = 256 * 1024
+
+
+def _log_since(since: int, tail_lines: int = 200) -> Dict[str, Any]:
+    """Log lines written after byte offset `since`, plus the offset to ask for next.
+
+    `offset` only advances past complete lines. Text after the last newline comes back as
+    `partial` and is read again next time, so clients show it provisionally and replace it.
+    `size` is the log size this answer covers.
+    """
+    try:
+        with EXEC_LOG.open("rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            if 0 <= since <= size and size - since <= LOG_CHUNK_LIMIT:
+                f.seek(since)
+                chunk = f.read(size - since)
+                end = chunk.rfind(b"\n") + 1
+                return {
+                    "offset": since + end,
+                    "size": size,
+                    "reset": False,
+                    "lines": chunk[:end].decode("utf-8", errors="replace").splitlines(),
+                    "partial": chunk[end:].decode("utf-8", errors="replace"),
+                }
+            # First poll, log cleared, or too far behind: start over from the tail.
+            f.seek(max(0, size - 65536))
+            last = f.read()
+            # Without a newline in the window, the window start is the best line boundary we have.
+            nl = last.rfind(b"\n")
+            end = size - len(last) + nl + 1
+            return {
+                "offset": end,
+                "size": size,
+                "reset": True,
+                "lines": _tail_from(f, end, tail_lines),
+                "partial": last[nl + 1:].decode("utf-8", errors="replace"),
+            }
+    except OSError:
+        return {"offset": 0, "size": 0, "reset": since != 0, "lines": [], "partial": ""}
+
+
 def _hash_payload(payload: Dict[str, Any]) -> str:
-    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
-    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    # Stored history keys depend on these exact bytes; orjson's sorted compact output matches
+    # json.dumps(ensure_ascii=False, sort_keys=True, separators=(",", ":")).
+    raw = None
+    if orjson is not None:
+        try:
+            raw = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass
+    if raw is None:
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()
 
 
 def _to_inbound_timeline(m: Dict[str, Any]) -> Dict[str, Any]:
@@ -237,22 +397,104 @@ def _history_key_for_item(item: Dict[str, Any]) -> str:
     return f"{direction}-{_hash_payload(payload)}"
 
 
-def _append_history_item(item: Dict[str, Any]) -> None:
-    with _file_lock(HISTORY_FILE):
-        data = _load_json(HISTORY_FILE, {"messages": []})
+def _timestamp_of(item: Dict[str, Any]) -> str:
+    return item.get("timestamp", "")
+
+
+def _append_history_items(path: Path, items: List[Dict[str, Any]]) -> None:
+    with _file_lock(path):
+        data = _load_json(path, {"messages": []})
         messages = data.setdefault("messages", [])
-        key = _history_key_for_item(item)
-        if any(_history_key_for_item(existing) == key for existing in messages if isinstance(existing, dict)):
-            return
-        normalized = dict(item)
-        normalized["history_key"] = key
-        messages.append(normalized)
-        messages.sort(key=lambda x: x.get("timestamp", ""))
-        _save_json(HISTORY_FILE, data)
+        # Stored items carry history_key, so this only hashes legacy entries.
+        keys = {_history_key_for_item(existing) for existing in messages if isinstance(existing, dict)}
+        added = False
+        for item in items:
+            key = _history_key_for_item(item)
+            if key in keys:
+                continue
+            keys.add(key)
+            normalized = dict(item)
+            normalized["history_key"] = key
+            # History is kept sorted by timestamp; insert after any equal timestamps like a stable sort would.
+            bisect.insort(messages, normalized, key=_timestamp_of)
+            added = True
+        if added:
+            _save_json(path, data)
+
+
+# post_message hands history appends to one writer thread instead of rewriting the history
+# file on the request path. The writer drains whatever has queued up and saves once per batch.
+# Until it lands, _to_timeline still shows the message from the queue files.
+_HISTORY_Q: "queue.Queue[Tuple[Path, Dict[str, Any]]]" = queue.Queue()
+_HISTORY_WRITER: Optional[threading.Thread] = None
+
+
+def _history_writer() -> None:
+    while True:
+        batch = [_HISTORY_Q.get()]
+        while True:
+            try:
+                batch.append(_HISTORY_Q.get_nowait())
+            except queue.Empty:
+                break
+        by_path: Dict[Path, List[Dict[str, Any]]] = {}
+        for path, item in batch:
+            by_path.setdefault(path, []).append(item)
+        for path, items in by_path.items():
+            try:
+                _append_history_items(path, items)
+            except Exception as exc:
+                print(f"[WARN] history write failed ({path}): {exc}")
+        for _ in batch:
+            _HISTORY_Q.task_done()
+
+
+def _queue_history_item(item: Dict[str, Any]) -> None:
+    global _HISTORY_WRITER
+    if _HISTORY_WRITER is None:
+        with _LOCKS_GUARD:
+            if _HISTORY_WRITER is None:
+                _HISTORY_WRITER = threading.Thread(target=_history_writer, name="history-writer", daemon=True)
+                _HISTORY_WRITER.start()
+                atexit.register(_flush_history)
+    # The path is bound now so a later HISTORY_FILE change cannot redirect the write.
+    _HISTORY_Q.put((HISTORY_FILE, item))
+
+
+def _flush_history() -> None:
+    """Block until every queued history append is on disk."""
+    _HISTORY_Q.join()
+
+
+def _stat_key(path: Path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _timeline_sources() -> tuple:
+    # Everything _to_timeline reads; all writers replace or append, so any change shows in stat().
+    return tuple(
+        (str(path), _stat_key(path))
+        for path in (MESSAGES_FILE, INBOX_LOG, PROCESSED_LOG, OUTBOX_FILE, HISTORY_FILE)
+    )
+
+
+def _invalidate_timeline() -> None:
+    global _TIMELINE_CACHE
+    _TIMELINE_CACHE = (None, None)
 
 
 def _to_timeline() -> List[Dict[str, Any]]:
-    inbound = _load_json(MESSAGES_FILE, {"messages": []}).get("messages", [])
+    global _TIMELINE_CACHE
+    sources = _timeline_sources()
+    cached_sources, cached = _TIMELINE_CACHE
+    if cached_sources == sources:
+        return list(cached)
+
+    inbound = _load_queue()
     outbox = _load_json(OUTBOX_FILE, {"messages": []}).get("messages", [])
 
     source_items = [_to_inbound_timeline(m) for m in inbound] + [_to_outbound_timeline(m) for m in outbox]
@@ -269,9 +511,11 @@ def _to_timeline() -> List[Dict[str, Any]]:
             if not isinstance(item, dict):
                 changed = True
                 continue
-            entry = dict(item)
-            key = _history_key_for_item(entry)
-            if entry.get("history_key") != key:
+            # Freshly loaded from disk, so entries can be updated in place.
+            entry = item
+            key = entry.get("history_key")
+            if not key or not isinstance(key, str):
+                key = _history_key_for_item(entry)
                 entry["history_key"] = key
                 changed = True
             if key in seen:
@@ -282,46 +526,63 @@ def _to_timeline() -> List[Dict[str, Any]]:
             normalized.append(entry)
 
         for item in source_items:
-            key = _history_key_for_item(item)
+            # The timeline converters already hashed the payload into history_key.
+            key = item["history_key"]
             if key in seen:
                 idx = key_to_index.get(key)
                 if idx is not None:
-                    merged = dict(normalized[idx])
+                    merged = normalized[idx]
                     for field, value in item.items():
                         if merged.get(field) != value:
                             merged[field] = value
                             changed = True
-                    normalized[idx] = merged
                 continue
-            entry = dict(item)
-            entry["history_key"] = key
             key_to_index[key] = len(normalized)
-            normalized.append(entry)
+            normalized.append(item)
             seen.add(key)
             changed = True
 
-        normalized.sort(key=lambda x: x.get("timestamp", ""))
+        normalized.sort(key=_timestamp_of)
         if changed:
             _save_json(HISTORY_FILE, {"messages": normalized})
+            # Our own history write must not count as a change on the next poll.
+            sources = sources[:-1] + ((str(HISTORY_FILE), _stat_key(HISTORY_FILE)),)
 
     timeline = []
     for item in normalized:
         payload = dict(item)
         payload.pop("history_key", None)
         timeline.append(payload)
-    return timeline
+    _TIMELINE_CACHE = (sources, timeline)
+    return list(timeline)
+
+
+@functools.lru_cache(maxsize=8)
+def _resolved_root(root: Path) -> Path:
+    # Only the served root is cached; keyed on it so tests that repoint ROOT get their own.
+    return root.resolve()
 
 
 def _safe_file_path(raw_path: str) -> Path:
-    candidate = (ROOT / raw_path).resolve()
-    if not str(candidate).startswith(str(ROOT.resolve())):
+    base = _resolved_root(ROOT)
+    # Resolved on every request: a symlink under the root may be added or repointed at any time.
+    candidate = (base / raw_path).resolve()
+    if not candidate.is_relative_to(base):
         raise HTTPException(status_code=403, detail="Forbidden path")
-    if not candidate.exists() or not candidate.is_file():
+    # Existence is checked per request; only the resolution is cached.
+    if not candidate.is_file():
         raise HTTPException(status_code=404, detail="File not found")
     return candidate
 
 
-app = FastAPI(title="Web Simulator Messenger", version="1.0.0")
+class _JSONResponse(JSONResponse):
+    """Dict-returning endpoints serialize through _dumps too: orjson when installed, else stdlib."""
+
+    def render(self, content: Any) -> bytes:
+        return _dumps(content)
+
+
+app = FastAPI(title="Web Simulator Messenger", version="1.0.0", default_response_class=_JSONResponse)
 app.mount("/web", StaticFiles(directory=str(WEB_DIR)), name="web")
 
 
@@ -331,8 +592,25 @@ def root() -> FileResponse:
 
 
 @app.get("/api/messages")
-def get_messages() -> Dict[str, Any]:
-    return {"ok": True, "messages": _to_timeline()}
+def get_messages(request: Request) -> Response:
+    # Same revalidation as /api/status: an unchanged timeline costs the pollers a few stat() calls.
+    body, etag = _timeline_body()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _timeline_body() -> Tuple[bytes, str]:
+    global _TIMELINE_BODY
+    _to_timeline()
+    timeline = _TIMELINE_CACHE[1]
+    built_from, body, etag = _TIMELINE_BODY
+    if timeline is None or built_from is not timeline:
+        body = _dumps({"ok": True, "messages": timeline or []})
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        _TIMELINE_BODY = (timeline, body, etag)
+    return body, etag
 
 
 @app.post("/api/messages")
@@ -341,20 +619,24 @@ def post_message(payload: IncomingMessage) -> Dict[str, Any]:
     if not text:
         raise HTTPException(status_code=400, detail="text is required")
 
+    msg = {
+        "message_id": None,
+        "chat_id": payload.chat_id,
+        "user": payload.user,
+        "text": text,
+        "timestamp": str(datetime.now()),
+        "processed": False,
+    }
     with _file_lock(MESSAGES_FILE):
         data = _load_json(MESSAGES_FILE, {"messages": [], "last_update_id": 0})
-        message_id = _next_message_id(data.get("messages", []))
-        msg = {
-            "message_id": message_id,
-            "chat_id": payload.chat_id,
-            "user": payload.user,
-            "text": text,
-            "timestamp": str(datetime.now()),
-            "processed": False,
-        }
+        message_id = msg["message_id"] = _next_message_id(data)
         data.setdefault("messages", []).append(msg)
+        data["next_message_id"] = message_id + 1
+        data["next_message_id_scanned"] = len(data["messages"])
+        # Stays synchronous: the executor triggered below reads this file.
         _save_json(MESSAGES_FILE, data)
-    _append_history_item(_to_inbound_timeline(msg))
+    _queue_history_item(_to_inbound_timeline(msg))
+    _invalidate_timeline()
 
     trigger_result = _trigger_executor()
     return {"ok": True, "message": msg, "trigger": trigger_result}
@@ -379,20 +661,46 @@ def send_test_message(payload: QuickTestMessage) -> Dict[str, Any]:
 
 
 @app.get("/api/status")
-def get_status() -> Dict[str, Any]:
+def get_status(request: Request, log_tail: bool = True) -> Response:
+    # Pollers (web UI, TUI) send the last ETag back and get an empty 304 while nothing changed.
+    # The web UI passes log_tail=0 and follows the log through /api/status/log instead.
+    body = _dumps(_status_payload(log_tail))
+    headers = {"ETag": f'"{hashlib.sha1(body).hexdigest()}"', "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/status/log")
+def get_status_log(since: int = -1) -> Dict[str, Any]:
+    return {"ok": True, **_log_since(since)}
+
+
+def _status_payload(include_log_tail: bool = True) -> Dict[str, Any]:
     working = _load_json(WORKING_FILE, {"active": False, "message_id": None, "time": ""})
-    queued = _load_json(MESSAGES_FILE, {"messages": [], "last_update_id": 0}).get("messages", [])
+    queued = _load_queue()
     pending = [m for m in queued if not m.get("processed")]
-    running = bool(_ACTIVE_PROCESS and _ACTIVE_PROCESS.poll() is None)
-    return {
+    # One read of the global: _watch_executor may clear it between checks. While the watcher
+    # sits in proc.wait() it holds Popen's waitpid lock, so poll() here is a lock probe, not
+    # a waitpid syscall, and the watcher's reset is what marks the executor as stopped.
+    proc = _ACTIVE_PROCESS
+    running = bool(proc and proc.poll() is None)
+    try:
+        log_size = EXEC_LOG.stat().st_size
+    except OSError:
+        log_size = 0
+    payload = {
         "ok": True,
         "working": working,
         "executor_running": running,
-        "executor_pid": (_ACTIVE_PROCESS.pid if running and _ACTIVE_PROCESS else None),
+        "executor_pid": (proc.pid if running else None),
         "pending_count": len(pending),
         "pending_ids": [m.get("message_id") for m in pending],
-        "log_tail": _tail_log(200),
+        "log_size": log_size,
     }
+    if include_log_tail:
+        payload["log_tail"] = _tail_log(200)
+    return payload
 
 
 @app.get("/api/files/{file_path:path}")
@@ -404,6 +712,7 @@ def get_file(file_path: str) -> FileResponse:
 @app.post("/api/reset")
 def reset_data() -> Dict[str, Any]:
     _save_json(OUTBOX_FILE, {"messages": []})
+    _invalidate_timeline()
     return {"ok": True}
 
 
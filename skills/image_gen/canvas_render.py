@@ -1,62 +1,235 @@
 import sys
 import os
 import time
+import asyncio
+import atexit
+import threading
 try:
     from playwright.sync_api import sync_playwright
 except ImportError:  # pragma: no cover - renderer falls back when missing
     sync_playwright = None
+try:
+    from playwright.async_api import async_playwright
+except ImportError:  # pragma: no cover
+    async_playwright = None
 
-def render_canvas(html_path, output_path, selector="#canvas-container", wait_time=2):
-    """
-    HTML 파일을 브라우저로 열어 특정 영역을 스크린샷으로 저장합니다.
-    """
+# One Chromium per process, launched on first render and closed at exit; each render gets
+# its own context. The sync API is not thread-safe, so renders take turns on the lock.
+_PW = None
+_BROWSER = None
+_BROWSER_LOCK = threading.Lock()
+
+# Async API: one Chromium per event loop, shared by concurrent renders (one context each).
+# Playwright objects are bound to the loop that created them, hence the per-loop state.
+MAX_CONCURRENT_RENDERS = 4
+_ASYNC_STATE = {}  # loop -> _LoopBrowser
+
+# 고해상도 지원을 위해 뷰포트 크게 설정
+_VIEWPORT = {'width': 1200, 'height': 1200}
+# 페이지가 그리기 완료를 직접 알리는 경우: 신호와 폰트 로딩만 기다림
+_HAS_READY_SIGNAL = "() => '__canvasReady' in window"
+_READY_SIGNAL = "() => window.__canvasReady === true"
+_FONTS_READY = "async () => { await document.fonts.ready; }"
+
+
+class _LoopBrowser:
+    """One event loop's Playwright and Chromium, open only while a render on that loop runs."""
+
+    def __init__(self):
+        self.playwright = None
+        self.browser = None
+        self.slots = asyncio.Semaphore(MAX_CONCURRENT_RENDERS)
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+def _get_browser():
+    global _PW, _BROWSER
+    if _BROWSER is not None and _BROWSER.is_connected():
+        return _BROWSER
+    if _PW is None:
+        _PW = sync_playwright().start()
+        atexit.register(_close_browser)
+    _BROWSER = _PW.chromium.launch(headless=True)
+    return _BROWSER
+
+
+def _close_browser():
+    global _PW, _BROWSER
+    try:
+        if _BROWSER is not None:
+            _BROWSER.close()
+    except Exception:
+        pass
+    try:
+        if _PW is not None:
+            _PW.stop()
+    except Exception:
+        pass
+    _PW = None
+    _BROWSER = None
+
+
+async def _get_async_browser(state):
+    async with state.lock:
+        if state.browser is None or not state.browser.is_connected():
+            if state.playwright is None:
+                state.playwright = await async_playwright().start()
+            state.browser = await state.playwright.chromium.launch(headless=True)
+    return state.browser
+
+
+async def _release_async_browser(loop, state):
+    # Closed by the last render out rather than at loop exit: asyncio.run() cancels
+    # Playwright's own connection task at the same time as any closer task, so a close
+    # awaited then would never get its reply.
+    state.users -= 1
+    async with state.lock:
+        if state.users:
+            return
+        if _ASYNC_STATE.get(loop) is state:
+            del _ASYNC_STATE[loop]
+        try:
+            if state.browser is not None:
+                await state.browser.close()
+        except Exception:
+            pass
+        try:
+            if state.playwright is not None:
+                await state.playwright.stop()
+        except Exception:
+            pass
+        state.browser = state.playwright = None
+
+
+def _prepare_render(html_path, output_path, api):
+    """file:// URL of html_path once output_path's directory exists, or None if html_path is missing."""
     if not os.path.exists(html_path):
         print(f"[ERROR] {html_path} not found.")
-        return False
+        return None
 
     output_dir = os.path.dirname(os.path.abspath(output_path))
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
 
+    if api is None:
+        raise RuntimeError("Playwright is required for canvas rendering but is not installed")
+
     abs_html_path = os.path.abspath(html_path)
     file_url = f"file:///{abs_html_path}".replace("\\", "/")
+    print(f"[INFO] Rendering: {file_url}")
+    return file_url
 
-    if sync_playwright is None:
-        raise RuntimeError("Playwright is required for canvas rendering but is not installed")
 
-    with sync_playwright() as p:
-        browser = None
+def _ready_timeout_ms(wait_time):
+    return max(wait_time, 5) * 1000
+
+
+def _selector_missing(selector):
+    print(f"[WARN] Selector '{selector}' not found. Taking full page screenshot.")
+
+
+def _render_done(output_path):
+    print(f"[OK] Image saved to {output_path}")
+    return True
+
+
+def _render_failed(error):
+    print(f"[ERROR] Rendering failed: {error}")
+    return False
+
+
+async def render_canvas_async(html_path, output_path, selector="#canvas-container", wait_time=2):
+    """
+    render_canvas의 async 버전. 같은 이벤트 루프의 렌더들이 브라우저 하나를 공유하며
+    최대 MAX_CONCURRENT_RENDERS개까지 동시에 진행됩니다.
+    """
+    file_url = _prepare_render(html_path, output_path, async_playwright)
+    if file_url is None:
+        return False
+
+    loop = asyncio.get_running_loop()
+    state = _ASYNC_STATE.get(loop)
+    if state is None:
+        state = _ASYNC_STATE[loop] = _LoopBrowser()
+    state.users += 1
+    try:
+        async with state.slots:
+            context = None
+            try:
+                context = await (await _get_async_browser(state)).new_context(viewport=_VIEWPORT)
+                page = await context.new_page()
+                await page.goto(file_url)
+
+                if await page.evaluate(_HAS_READY_SIGNAL):
+                    await page.wait_for_function(_READY_SIGNAL, timeout=_ready_timeout_ms(wait_time))
+                    await page.evaluate(_FONTS_READY)
+                else:
+                    await page.wait_for_load_state('networkidle')
+                    if wait_time > 0:
+                        await asyncio.sleep(wait_time)
+
+                target = page.locator(selector)
+                if await target.count() == 0:
+                    _selector_missing(selector)
+                    await page.screenshot(path=output_path)
+                else:
+                    await target.screenshot(path=output_path)
+                return _render_done(output_path)
+            except Exception as e:
+                return _render_failed(e)
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+    finally:
+        await _release_async_browser(loop, state)
+
+
+def render_canvas(html_path, output_path, selector="#canvas-container", wait_time=2):
+    """
+    HTML 파일을 브라우저로 열어 특정 영역을 스크린샷으로 저장합니다.
+    """
+    file_url = _prepare_render(html_path, output_path, sync_playwright)
+    if file_url is None:
+        return False
+
+    with _BROWSER_LOCK:
+        context = None
         try:
-            browser = p.chromium.launch(headless=True)
-            # 고해상도 지원을 위해 뷰포트 크게 설정
-            page = browser.new_page(viewport={'width': 1200, 'height': 1200})
-            
-            print(f"[INFO] Rendering: {file_url}")
+            context = _get_browser().new_context(viewport=_VIEWPORT)
+            page = context.new_page()
             page.goto(file_url)
-            
-            # 네트워크가 안정될 때까지 대기
-            page.wait_for_load_state('networkidle')
-            
-            # JS 애니메이션이나 렌더링 시간을 위해 추가 대기
-            if wait_time > 0:
-                time.sleep(wait_time)
-            
+
+            if page.evaluate(_HAS_READY_SIGNAL):
+                page.wait_for_function(_READY_SIGNAL, timeout=_ready_timeout_ms(wait_time))
+                page.evaluate(_FONTS_READY)
+            else:
+                # 네트워크가 안정될 때까지 대기
+                page.wait_for_load_state('networkidle')
+
+                # JS 애니메이션이나 렌더링 시간을 위해 추가 대기
+                if wait_time > 0:
+                    time.sleep(wait_time)
+
             # 스크린샷 대상 확인
             target = page.locator(selector)
             if target.count() == 0:
-                print(f"[WARN] Selector '{selector}' not found. Taking full page screenshot.")
+                _selector_missing(selector)
                 page.screenshot(path=output_path)
             else:
                 target.screenshot(path=output_path)
-            
-            print(f"[OK] Image saved to {output_path}")
-            return True
+            return _render_done(output_path)
         except Exception as e:
-            print(f"[ERROR] Rendering failed: {e}")
-            return False
+            return _render_failed(e)
         finally:
-            if browser:
-                browser.close()
+            if context is not None:
+                try:
+                    context.close()
+                except Exception:
+                    pass
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
@@ -27,25 +27,33 @@ Environment variables:
 - STOCK_IMAGE_TIMEOUT (default: 25)
 - STOCK_IMAGE_WIDTH / STOCK_IMAGE_HEIGHT (default: 1600 / 1200)
 - STOCK_IMAGE_RETRIES (default: 3)
+- IMAGE_GEN_CACHE: 0 to always regenerate instead of reusing a cached image for the same prompt (default: 1)
 """
 
 import asyncio
 import ast
 import base64
+import functools
+import hashlib
 import io
 import json
 import os
+import queue
 import re
 import shutil
 import subprocess
 import sys
+import threading
 import time
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
 from urllib.parse import quote_plus
 from urllib.request import Request, urlopen
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except Exception:
     requests = None
 
@@ -55,11 +63,36 @@ GEN_DIR = os.path.join(_DIR, "generated")
 RENDER_SCRIPT = os.path.join(_DIR, "canvas_render.py")
 CODEX_MD = os.path.join(BASE_DIR, "codex.md")
 
+CACHE_DIR = os.path.join(GEN_DIR, "cache")
+# Bump when a provider's output changes for the same inputs (e.g. the canvas template).
+CACHE_VERSION = 1
+MIN_CACHED_BYTES = 15 * 1024
+
 os.makedirs(GEN_DIR, exist_ok=True)
 
 
+_SLUG_RE = re.compile(r"[^a-zA-Z0-9]+")
+_TOKEN_RE = re.compile(r"[a-zA-Z0-9]+")
+_STOPWORDS = frozenset(("the", "and", "with", "from", "that", "this", "for", "shot", "image"))
+
+
+def _keyword_re(*keywords: str) -> "re.Pattern[str]":
+    # Substring match, as `any(k in text ...)` was; keeps Korean and hyphenated keywords working.
+    return re.compile("|".join(map(re.escape, keywords)))
+
+
+_PRODUCT_RE = _keyword_re("product", "detail", "close-up", "closeup", "shot", "feature", "thumbnail")
+_THEME_RES = (
+    ("cafe", _keyword_re("cafe", "coffee", "latte", "espresso", "roastery", "menu", "카페", "커피", "라떼")),
+    ("tech", _keyword_re("tech", "saas", "ai", "startup", "software", "dashboard")),
+    ("fashion", _keyword_re("fashion", "lookbook", "apparel", "style")),
+    ("travel", _keyword_re("travel", "hotel", "resort", "beach", "trip", "tour")),
+    ("medical", _keyword_re("medical", "clinic", "hospital", "health")),
+)
+
+
 def _slugify(text: str, max_len: int = 48) -> str:
-    slug = re.sub(r"[^a-zA-Z0-9]+", "_", text).strip("_").lower()
+    slug = _SLUG_RE.sub("_", text).strip("_").lower()
     return slug[:max_len] or "image"
 
 
@@ -104,30 +137,45 @@ def _resolve_codex_executables():
         return candidates
 
     # Then try common command paths.
-    _add(shutil.which("codex.exe"))
-    _add(shutil.which("codex.cmd"))
-    _add(shutil.which("codex"))
-    _add(shutil.which("codex.ps1"))
+    for found in _codex_on_path(os.getenv("PATH")):
+        _add(found)
 
     return candidates
 
 
+@functools.lru_cache(maxsize=8)
+def _codex_on_path(path_env: Optional[str]) -> Tuple[Optional[str], ...]:
+    # Keyed on PATH: each which() stats every PATH entry, which adds up on long Windows PATHs.
+    return tuple(shutil.which(name, path=path_env) for name in ("codex.exe", "codex.cmd", "codex", "codex.ps1"))
+
+
+def _parse_payload_candidate(raw: str):
+    if raw.startswith("{") and raw.endswith("}"):
+        # Try JSON first, then Python dict literal.
+        try:
+            return json.loads(raw)
+        except Exception:
+            pass
+        try:
+            return ast.literal_eval(raw)
+        except Exception:
+            pass
+    return None
+
+
 def _parse_payload_line(text: str):
-    lines = (text or "").splitlines()
-    for line in reversed(lines):
-        raw = line.strip()
-        if not raw:
-            continue
-        if raw.startswith("{") and raw.endswith("}"):
-            # Try JSON first, then Python dict literal.
-            try:
-                return json.loads(raw)
-            except Exception:
-                pass
-            try:
-                return ast.literal_eval(raw)
-            except Exception:
-                pass
+    # Walk lines back from the end; the payload is normally the last one, so nothing
+    # before it is split or copied.
+    text = text or ""
+    end = len(text)
+    while end > 0:
+        start = text.rfind("\n", 0, end) + 1
+        # A bare \r (progress redraw) ends a line too, as it did under splitlines().
+        for line in reversed(text[start:end].split("\r")):
+            payload = _parse_payload_candidate(line.strip())
+            if payload is not None:
+                return payload
+        end = start - 1
     return None
 
 
@@ -140,7 +188,11 @@ def _candidate_codex_models() -> List[Optional[str]]:
     raw_image = (os.getenv("CODEX_IMAGE_MODEL") or "").strip()
     raw_general = (os.getenv("CODEX_MODEL") or "").strip()
     raw_candidates = (os.getenv("CODEX_IMAGE_MODEL_CANDIDATES") or "").strip()
+    return list(_codex_models_for(raw_image, raw_general, raw_candidates))
+
 
+@functools.lru_cache(maxsize=32)
+def _codex_models_for(raw_image: str, raw_general: str, raw_candidates: str) -> Tuple[Optional[str], ...]:
     candidates: List[Optional[str]] = []
     if raw_image:
         candidates.append(raw_image)
@@ -159,7 +211,7 @@ def _candidate_codex_models() -> List[Optional[str]]:
 
     # Final fallback: let codex-cli choose default model.
     candidates.append(None)
-    return candidates
+    return tuple(candidates)
 
 
 def _env_bool(name: str, default: bool = False) -> bool:
@@ -241,6 +293,57 @@ def _is_image_generation_unavailable(error_text: str) -> bool:
     return "image generation not available in this environment" in s
 
 
+# _parse_payload_line only looks for the last JSON line, so that is all of stdout we keep.
+CODEX_STDOUT_TAIL_LINES = 64
+
+
+def _run_codex(cmd, task_prompt: str, timeout: int, env: Dict) -> Tuple[Optional[int], str, str]:
+    """Run one codex exec and return (returncode, stdout tail, stderr); returncode is None on timeout."""
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        cwd=BASE_DIR,
+    )
+    tail = deque(maxlen=CODEX_STDOUT_TAIL_LINES)
+    err_chunks = []
+
+    def _drain_stdout():
+        for line in proc.stdout:
+            if line.strip():
+                tail.append(line)
+
+    def _drain_stderr():
+        # Kept whole: the launcher/model/read-only checks search all of it.
+        err_chunks.append(proc.stderr.read())
+
+    readers = [threading.Thread(target=fn, daemon=True) for fn in (_drain_stdout, _drain_stderr)]
+    for reader in readers:
+        reader.start()
+    try:
+        try:
+            proc.stdin.write(task_prompt.encode("utf-8"))
+            proc.stdin.close()
+        except OSError:
+            pass  # codex exited before reading the prompt; its output says why
+        try:
+            returncode = proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            returncode = None
+    finally:
+        for reader in readers:
+            reader.join()
+        proc.stdout.close()
+        proc.stderr.close()
+    stdout = b"".join(tail).decode("utf-8", errors="replace")
+    stderr = b"".join(err_chunks).decode("utf-8", errors="replace")
+    return returncode, stdout, stderr
+
+
 def _generate_with_codex_cli(prompt: str, image_path: str) -> Dict:
     candidates = _resolve_codex_executables()
     if not candidates:
@@ -253,57 +356,38 @@ def _generate_with_codex_cli(prompt: str, image_path: str) -> Dict:
     env.pop("CODEX_THREAD_ID", None)
     env.pop("CODEX_INTERNAL_ORIGINATOR_OVERRIDE", None)
 
+    models = _candidate_codex_models()
     last_failure = None
     for codex_prefix, codex_resolved in candidates:
-        for model in _candidate_codex_models():
+        for model in models:
             cmd, task_prompt = _build_codex_cli_command(codex_prefix, prompt, image_path, model=model)
 
             try:
-                result = subprocess.run(
-                    cmd,
-                    input=task_prompt,
-                    capture_output=True,
-                    text=True,
-                    encoding="utf-8",
-                    errors="replace",
-                    timeout=timeout,
-                    env=env,
-                    cwd=BASE_DIR,
-                )
-            except subprocess.TimeoutExpired as exc:
-                stdout = ""
-                stderr = ""
-                if isinstance(getattr(exc, "stdout", None), bytes):
-                    stdout = exc.stdout.decode("utf-8", errors="replace")
-                elif isinstance(getattr(exc, "stdout", None), str):
-                    stdout = exc.stdout
-                if isinstance(getattr(exc, "stderr", None), bytes):
-                    stderr = exc.stderr.decode("utf-8", errors="replace")
-                elif isinstance(getattr(exc, "stderr", None), str):
-                    stderr = exc.stderr
+                returncode, stdout, stderr = _run_codex(cmd, task_prompt, timeout, env)
+            except Exception as exc:
                 last_failure = {
                     "ok": False,
-                    "error": f"codex_cli timeout after {timeout}s",
+                    "error": f"codex_cli execution failed: {exc}",
                     "codex_exe": codex_resolved,
                     "model": model,
                     "cmd": cmd,
-                    "stdout": (stdout or "").strip(),
-                    "stderr": (stderr or "").strip(),
                 }
                 continue
-            except Exception as exc:
+
+            stdout = stdout.strip()
+            stderr = stderr.strip()
+            if returncode is None:
                 last_failure = {
                     "ok": False,
-                    "error": f"codex_cli execution failed: {exc}",
+                    "error": f"codex_cli timeout after {timeout}s",
                     "codex_exe": codex_resolved,
                     "model": model,
                     "cmd": cmd,
+                    "stdout": stdout,
+                    "stderr": stderr,
                 }
                 continue
 
-            stdout = (result.stdout or "").strip()
-            stderr = (result.stderr or "").strip()
-
             if os.path.exists(image_path) and os.path.getsize(image_path) > 0:
                 return {
                     "ok": True,
@@ -311,7 +395,7 @@ def _generate_with_codex_cli(prompt: str, image_path: str) -> Dict:
                     "image_path": image_path,
                     "stdout": stdout,
                     "stderr": stderr,
-                    "returncode": result.returncode,
+                    "returncode": returncode,
                     "cmd": cmd,
                     "codex_exe": codex_resolved,
                     "model": model,
@@ -327,7 +411,7 @@ def _generate_with_codex_cli(prompt: str, image_path: str) -> Dict:
                         "image_path": payload_path,
                         "stdout": stdout,
                         "stderr": stderr,
-                        "returncode": result.returncode,
+                        "returncode": returncode,
                         "cmd": cmd,
                         "codex_exe": codex_resolved,
                         "model": model,
@@ -340,7 +424,7 @@ def _generate_with_codex_cli(prompt: str, image_path: str) -> Dict:
                         "error": payload_error,
                         "stdout": stdout,
                         "stderr": stderr,
-                        "returncode": result.returncode,
+                        "returncode": returncode,
                         "cmd": cmd,
                         "codex_exe": codex_resolved,
                         "model": model,
@@ -362,7 +446,7 @@ def _generate_with_codex_cli(prompt: str, image_path: str) -> Dict:
                 "error": "codex_cli did not produce an output image.",
                 "stdout": stdout,
                 "stderr": stderr,
-                "returncode": result.returncode,
+                "returncode": returncode,
                 "cmd": cmd,
                 "codex_exe": codex_resolved,
                 "model": model,
@@ -383,29 +467,23 @@ def _generate_with_codex_cli(prompt: str, image_path: str) -> Dict:
                 continue
 
             # Retry another executable only for launcher-level failures.
-            if not _is_launcher_error(stderr, result.returncode):
+            if not _is_launcher_error(stderr, returncode):
                 return last_failure
 
     return last_failure or {"ok": False, "error": "codex_cli failed with unknown launcher error."}
 
 
+@functools.lru_cache(maxsize=512)
 def _detect_theme(prompt: str) -> Tuple[str, bool]:
     lower = (prompt or "").lower()
-    is_product = any(k in lower for k in ["product", "detail", "close-up", "closeup", "shot", "feature", "thumbnail"])
-
-    if any(k in lower for k in ["cafe", "coffee", "latte", "espresso", "roastery", "menu", "카페", "커피", "라떼"]):
-        return "cafe", is_product
-    if any(k in lower for k in ["tech", "saas", "ai", "startup", "software", "dashboard"]):
-        return "tech", is_product
-    if any(k in lower for k in ["fashion", "lookbook", "apparel", "style"]):
-        return "fashion", is_product
-    if any(k in lower for k in ["travel", "hotel", "resort", "beach", "trip", "tour"]):
-        return "travel", is_product
-    if any(k in lower for k in ["medical", "clinic", "hospital", "health"]):
-        return "medical", is_product
+    is_product = _PRODUCT_RE.search(lower) is not None
+    for theme, pattern in _THEME_RES:
+        if pattern.search(lower):
+            return theme, is_product
     return "default", is_product
 
 
+@functools.lru_cache(maxsize=512)
 def _build_sd_prompt(prompt: str) -> str:
     theme, _ = _detect_theme(prompt)
     suffix = (
@@ -436,14 +514,45 @@ def _sd_negative_prompt() -> str:
     )
 
 
+# txt2img reuses keep-alive connections to the WebUI and retries with backoff. The
+# availability probe has its own session without retries so a down WebUI fails fast.
+_SD_SESSION = None
+_SD_PROBE_SESSION = None
+if requests is not None:
+    _SD_SESSION = requests.Session()
+    _sd_adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=Retry(total=2, backoff_factor=0.2))
+    _SD_SESSION.mount("http://", _sd_adapter)
+    _SD_SESSION.mount("https://", _sd_adapter)
+    _SD_PROBE_SESSION = requests.Session()
+    _sd_probe_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=Retry(0))
+    _SD_PROBE_SESSION.mount("http://", _sd_probe_adapter)
+    _SD_PROBE_SESSION.mount("https://", _sd_probe_adapter)
+
+# Connect timeout for the availability probe; an unreachable WebUI should not stall the chain.
+SD_PROBE_CONNECT_TIMEOUT = 2
+
+SD_PROBE_TTL = 30.0
+# (base_url, monotonic deadline, available) from the last probe.
+_SD_PROBE: Tuple[str, float, bool] = ("", 0.0, False)
+
+
 def _sd_webui_available(base_url: str, timeout: int) -> bool:
-    if requests is None:
+    global _SD_PROBE
+    if _SD_PROBE_SESSION is None:
         return False
+    url, deadline, ok = _SD_PROBE
+    if url == base_url and time.monotonic() < deadline:
+        return ok
     try:
-        resp = requests.get(f"{base_url.rstrip('/')}/sdapi/v1/options", timeout=timeout)
-        return resp.status_code < 500
+        resp = _SD_PROBE_SESSION.get(
+            f"{base_url.rstrip('/')}/sdapi/v1/options",
+            timeout=(min(SD_PROBE_CONNECT_TIMEOUT, timeout), timeout),
+        )
+        ok = resp.status_code < 500
     except Exception:
-        return False
+        ok = False
+    _SD_PROBE = (base_url, time.monotonic() + SD_PROBE_TTL, ok)
+    return ok
 
 
 def _generate_with_sd_webui(prompt: str, image_path: str) -> Dict:
@@ -476,7 +585,7 @@ def _generate_with_sd_webui(prompt: str, image_path: str) -> Dict:
     }
 
     try:
-        response = requests.post(f"{base_url}/sdapi/v1/txt2img", json=payload, timeout=timeout)
+        response = _SD_SESSION.post(f"{base_url}/sdapi/v1/txt2img", json=payload, timeout=timeout)
         response.raise_for_status()
         data = response.json()
         images = data.get("images") or []
@@ -509,13 +618,14 @@ def _generate_with_sd_webui(prompt: str, image_path: str) -> Dict:
         return {"ok": False, "error": f"SD WebUI generation failed: {exc}"}
 
 
+@functools.lru_cache(maxsize=512)
 def _stock_query_from_prompt(prompt: str) -> str:
-    tokens = re.findall(r"[a-zA-Z0-9]+", (prompt or "").lower())
+    tokens = _TOKEN_RE.findall((prompt or "").lower())
     if not tokens:
         return "product,studio,photo"
     compact = []
     for token in tokens:
-        if token in ("the", "and", "with", "from", "that", "this", "for", "shot", "image"):
+        if token in _STOPWORDS:
             continue
         compact.append(token)
         if len(compact) >= 6:
@@ -525,18 +635,118 @@ def _stock_query_from_prompt(prompt: str) -> str:
     return ",".join(compact)
 
 
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Zero-length IEND chunk (type + CRC) that closes every complete PNG.
+PNG_IEND = b"IEND\xaeB`\x82"
+
+
+def _png_complete(binary: bytes) -> bool:
+    """True when a PNG payload is whole: IEND trailer present and, with Pillow, chunk CRCs verify."""
+    if not binary.endswith(PNG_IEND):
+        return False
+    try:
+        from PIL import Image
+    except Exception:
+        return True
+    try:
+        with Image.open(io.BytesIO(binary)) as img:
+            img.verify()
+        return True
+    except Exception:
+        return False
+
+
 def _write_png(binary: bytes, image_path: str) -> bool:
+    if binary.startswith(PNG_SIGNATURE):
+        if not _png_complete(binary):
+            return False
+        # Already a whole PNG: store the upstream bytes rather than decoding and re-encoding them.
+        with open(image_path, "wb") as f:
+            f.write(binary)
+        return True
     try:
         from PIL import Image
 
         with Image.open(io.BytesIO(binary)) as img:
+            # JPEG sources let libjpeg decode straight to RGB; a no-op for other formats.
+            img.draft("RGB", img.size)
             converted = img.convert("RGB")
-            converted.save(image_path, format="PNG", optimize=True)
+            # Fast deflate: a second optimize pass costs more CPU than the bytes it saves here.
+            converted.save(image_path, format="PNG", compress_level=1)
         return True
     except Exception:
         return False
 
 
+_STOCK_HEADERS = {"User-Agent": "codex-cbot-image-gen/1.0", "Accept": "image/*"}
+# A pooled session per fetch thread, so retries and later prompts reuse the TLS connections
+# to picsum/loremflickr instead of handshaking per URL. requests.Session is not documented
+# as thread-safe (cookie jar, adapter state), so the _STOCK_FETCHERS workers never share one.
+_STOCK_LOCAL = threading.local()
+
+
+def _stock_session():
+    session = getattr(_STOCK_LOCAL, "session", None)
+    if session is None:
+        session = _STOCK_LOCAL.session = requests.Session()
+        session.headers.update(_STOCK_HEADERS)
+    return session
+
+
+def _fetch_stock_bytes(url: str, timeout: int) -> bytes:
+    if requests is not None:
+        resp = _stock_session().get(url, timeout=timeout)
+        resp.raise_for_status()
+        return resp.content
+    with urlopen(Request(url, headers=_STOCK_HEADERS), timeout=timeout) as resp:
+        return resp.read()
+
+
+# Built-in stock hosts are raced rather than tried in turn, so a slow picsum no longer
+# delays the loremflickr fallback. The workers are daemon threads: a losing fetch still in
+# flight is abandoned when image_gen.py exits, where ThreadPoolExecutor would join it and
+# keep the CLI process alive until that request timed out.
+_STOCK_WORKERS = 4
+_STOCK_JOBS: "queue.Queue[Tuple[str, int, queue.Queue, threading.Event]]" = queue.Queue()
+_STOCK_STARTED: List[threading.Thread] = []
+_STOCK_START_LOCK = threading.Lock()
+
+
+def _stock_worker() -> None:
+    while True:
+        url, timeout, results, abandoned = _STOCK_JOBS.get()
+        if abandoned.is_set():
+            continue
+        try:
+            results.put((url, _fetch_stock_bytes(url, timeout), ""))
+        except Exception as exc:
+            results.put((url, None, str(exc)))
+
+
+def _start_stock_workers() -> None:
+    with _STOCK_START_LOCK:
+        while len(_STOCK_STARTED) < _STOCK_WORKERS:
+            worker = threading.Thread(target=_stock_worker, name=f"stock-fetch-{len(_STOCK_STARTED)}", daemon=True)
+            worker.start()
+            _STOCK_STARTED.append(worker)
+
+
+def _fetch_in_completion_order(url_groups: List[List[str]], timeout: int) -> Iterator[Tuple[str, Optional[bytes], str]]:
+    """(url, payload, error) per url: groups in order, fastest response first within a group."""
+    _start_stock_workers()
+    for urls in url_groups:
+        results: "queue.Queue[Tuple[str, Optional[bytes], str]]" = queue.Queue()
+        abandoned = threading.Event()
+        for url in urls:
+            _STOCK_JOBS.put((url, timeout, results, abandoned))
+        try:
+            for _ in urls:
+                yield results.get()
+        finally:
+            # Jobs not picked up yet are skipped; ones in flight finish and are dropped.
+            abandoned.set()
+
+
 def _generate_with_stock_photo(prompt: str, image_path: str) -> Dict:
     timeout = _env_int("STOCK_IMAGE_TIMEOUT", 25)
     width = _env_int("STOCK_IMAGE_WIDTH", 1600)
@@ -555,37 +765,37 @@ def _generate_with_stock_photo(prompt: str, image_path: str) -> Dict:
             f"https://picsum.photos/seed/{seed}/{width}/{height}",
             f"https://loremflickr.com/{width}/{height}/{encoded_query}/all?r={nonce}",
         ]
+        url_groups = [candidate_urls]
         custom_template = (os.getenv("STOCK_IMAGE_URL_TEMPLATE") or "").strip()
         if custom_template:
-            candidate_urls.insert(
+            # A configured template keeps priority: it gets a turn on its own before the race.
+            url_groups.insert(
                 0,
-                custom_template.format(
-                    width=width,
-                    height=height,
-                    query=encoded_query,
-                    seed=seed,
-                    nonce=nonce,
-                ),
+                [
+                    custom_template.format(
+                        width=width,
+                        height=height,
+                        query=encoded_query,
+                        seed=seed,
+                        nonce=nonce,
+                    )
+                ],
             )
 
-        for url in candidate_urls:
+        for url, binary, fetch_error in _fetch_in_completion_order(url_groups, timeout):
             final_url = url
+            if fetch_error:
+                last_error = fetch_error
+                continue
             try:
-                req = Request(
-                    url,
-                    headers={
-                        "User-Agent": "codex-cbot-image-gen/1.0",
-                        "Accept": "image/*",
-                    },
-                )
-                with urlopen(req, timeout=timeout) as resp:
-                    binary = resp.read()
-
                 if not binary or len(binary) < 15 * 1024:
                     last_error = f"received too-small payload ({len(binary) if binary else 0} bytes)"
                     continue
 
                 if not _write_png(binary, image_path):
+                    if binary.startswith(PNG_SIGNATURE):
+                        last_error = "received truncated or corrupt PNG payload"
+                        continue
                     with open(image_path, "wb") as f:
                         f.write(binary)
 
@@ -635,6 +845,7 @@ def _build_canvas_html(prompt: str) -> str:
 <body>
   <div id=\"canvas-container\"><canvas id=\"art\" width=\"1200\" height=\"1200\"></canvas></div>
   <script>
+    window.__canvasReady = false;
     const prompt = '{escaped_prompt}';
     const lowerPrompt = prompt.toLowerCase();
     const theme = '{theme}';
@@ -837,12 +1048,26 @@ def _build_canvas_html(prompt: str) -> str:
     ctx.fillStyle = 'rgba(255,255,255,0.8)';
     const shortPrompt = prompt.length > 82 ? prompt.slice(0, 82) + '...' : prompt;
     ctx.fillText(shortPrompt, 72, 1134);
+    window.__canvasReady = true;
   </script>
 </body>
 </html>
 """
 
 
+def _load_render_canvas_async():
+    """canvas_render.render_canvas_async, or None when the async Playwright API is unavailable."""
+    if _DIR not in sys.path:
+        sys.path.insert(0, _DIR)
+    try:
+        import canvas_render
+    except Exception:
+        return None
+    if getattr(canvas_render, "async_playwright", None) is None:
+        return None
+    return canvas_render.render_canvas_async
+
+
 async def _generate_with_canvas(prompt: str, html_path: str, image_path: str) -> Dict:
     if not os.path.exists(RENDER_SCRIPT):
         return {"ok": False, "error": f"Renderer not found: {RENDER_SCRIPT}"}
@@ -850,6 +1075,20 @@ async def _generate_with_canvas(prompt: str, html_path: str, image_path: str) ->
     with open(html_path, "w", encoding="utf-8") as f:
         f.write(_build_canvas_html(prompt))
 
+    render_async = _load_render_canvas_async()
+    if render_async is not None:
+        # In-process: concurrent generate_image() calls share one browser instead of
+        # each spawning an interpreter and a Chromium.
+        try:
+            rendered = await render_async(html_path, image_path, "#canvas-container", 0.6)
+        except Exception as exc:
+            rendered, error = False, str(exc)
+        else:
+            error = "Canvas renderer failed."
+        if not rendered or not os.path.exists(image_path):
+            return {"ok": False, "error": error, "html_path": html_path, "image_path": image_path}
+        return {"ok": True, "provider": "canvas", "prompt": prompt, "html_path": html_path, "image_path": image_path}
+
     cmd = [sys.executable, RENDER_SCRIPT, html_path, image_path, "#canvas-container", "0.6"]
     proc = await asyncio.create_subprocess_exec(
         *cmd,
@@ -882,6 +1121,89 @@ async def _generate_with_canvas(prompt: str, html_path: str, image_path: str) ->
     }
 
 
+def _cache_params(provider: str) -> Dict:
+    """Provider settings that change the output, so changing any of them misses the cache."""
+    if provider == "codex_cli":
+        return {
+            "models": _candidate_codex_models(),
+            "shell_tools": _env_bool("CODEX_IMAGE_ALLOW_SHELL_TOOLS", False),
+        }
+    if provider == "sd_webui":
+        return {
+            "url": os.getenv("SD_WEBUI_URL", "http://127.0.0.1:7860").rstrip("/"),
+            "width": _env_int("SD_WEBUI_WIDTH", 1200),
+            "height": _env_int("SD_WEBUI_HEIGHT", 1200),
+            "steps": _env_int("SD_WEBUI_STEPS", 28),
+            "cfg": _env_float("SD_WEBUI_CFG", 7.0),
+            "sampler": os.getenv("SD_WEBUI_SAMPLER", "DPM++ 2M Karras"),
+            "negative": _sd_negative_prompt(),
+        }
+    if provider == "stock":
+        return {
+            "width": _env_int("STOCK_IMAGE_WIDTH", 1600),
+            "height": _env_int("STOCK_IMAGE_HEIGHT", 1200),
+            "template": (os.getenv("STOCK_IMAGE_URL_TEMPLATE") or "").strip(),
+        }
+    return {}
+
+
+def _cache_key(prompt: str, provider: str, params: Dict) -> str:
+    raw = json.dumps([CACHE_VERSION, provider, prompt, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()[:20]
+
+
+def _cache_path(prompt: str, provider: str) -> str:
+    return os.path.join(CACHE_DIR, _cache_key(prompt, provider, _cache_params(provider)) + ".png")
+
+
+def _cached_image(path: str) -> bool:
+    try:
+        return os.path.getsize(path) > MIN_CACHED_BYTES
+    except OSError:
+        return False
+
+
+def _copy_into(src: str, dst: str) -> None:
+    # Copy rather than hard-link: providers overwrite image_path in place, which must not
+    # rewrite the cached copy through a shared inode.
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def _from_cache(provider: str, prompt: str, image_path: str) -> Optional[Dict]:
+    """A copy of the image `provider` last made for this prompt, or None to run the provider."""
+    if not _env_bool("IMAGE_GEN_CACHE", True):
+        return None
+    cached = _cache_path(prompt, provider)
+    if not _cached_image(cached):
+        return None
+    try:
+        _copy_into(cached, image_path)
+    except OSError:
+        return None
+    # Keep the original provider name: web_builder checks it against the realistic providers.
+    return {
+        "ok": True,
+        "provider": provider,
+        "cached": True,
+        "prompt": prompt,
+        "image_path": image_path,
+        "html_path": None,
+    }
+
+
+def _store_in_cache(provider: str, prompt: str, result: Dict) -> None:
+    src = result.get("image_path") or ""
+    if not _env_bool("IMAGE_GEN_CACHE", True) or not src.lower().endswith(".png"):
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _copy_into(src, _cache_path(prompt, provider))
+    except OSError:
+        pass
+
+
 async def generate_image(prompt: str):
     """Generate a local image from prompt using configured provider chain."""
     normalized = (prompt or "").strip()
@@ -898,9 +1220,14 @@ async def generate_image(prompt: str):
 
     try:
         if provider in ("auto", "codex_cli"):
+            cached = _from_cache("codex_cli", normalized, image_path)
+            if cached:
+                cached["attempts"] = attempts
+                return cached
             codex_result = _generate_with_codex_cli(normalized, image_path)
             attempts.append({"provider": "codex_cli", "ok": codex_result.get("ok"), "error": codex_result.get("error")})
             if codex_result.get("ok"):
+                _store_in_cache("codex_cli", normalized, codex_result)
                 codex_result.update({"prompt": normalized, "html_path": None, "attempts": attempts})
                 return codex_result
             if provider == "codex_cli":
@@ -910,9 +1237,14 @@ async def generate_image(prompt: str):
                 return codex_result
 
         if provider in ("auto", "sd_webui"):
+            cached = _from_cache("sd_webui", normalized, image_path)
+            if cached:
+                cached["attempts"] = attempts
+                return cached
             sd_result = _generate_with_sd_webui(normalized, image_path)
             attempts.append({"provider": "sd_webui", "ok": sd_result.get("ok"), "error": sd_result.get("error")})
             if sd_result.get("ok"):
+                _store_in_cache("sd_webui", normalized, sd_result)
                 sd_result.update({"prompt": normalized, "html_path": None})
                 return sd_result
             if provider == "sd_webui":
@@ -922,9 +1254,14 @@ async def generate_image(prompt: str):
                 return sd_result
 
         if provider in ("auto", "stock"):
+            cached = _from_cache("stock", normalized, image_path)
+            if cached:
+                cached["attempts"] = attempts
+                return cached
             stock_result = _generate_with_stock_photo(normalized, image_path)
             attempts.append({"provider": "stock", "ok": stock_result.get("ok"), "error": stock_result.get("error")})
             if stock_result.get("ok"):
+                _store_in_cache("stock", normalized, stock_result)
                 stock_result.update({"prompt": normalized, "html_path": None, "attempts": attempts})
                 return stock_result
             if provider == "stock":
@@ -933,9 +1270,14 @@ async def generate_image(prompt: str):
                 stock_result["html_path"] = None
                 return stock_result
 
+        cached = _from_cache("canvas", normalized, image_path)
+        if cached:
+            cached["attempts"] = attempts
+            return cached
         canvas_result = await _generate_with_canvas(normalized, html_path, image_path)
         attempts.append({"provider": "canvas", "ok": canvas_result.get("ok"), "error": canvas_result.get("error")})
         if canvas_result.get("ok"):
+            _store_in_cache("canvas", normalized, canvas_result)
             canvas_result["attempts"] = attempts
             return canvas_result
 
@@ -323,6 +323,14 @@ def generate_photorealistic_assets(assets, project_dir):
 
     return all_ok
 
+def _load_render_canvas(render_script):
+    """Import image_gen/canvas_render.py once and return its render_canvas."""
+    render_dir = os.path.dirname(render_script)
+    if render_dir not in sys.path:
+        sys.path.insert(0, render_dir)
+    from canvas_render import render_canvas
+    return render_canvas
+
 def generate_missing_assets(assets, project_dir):
     """
     Checks if assets in the 'assets' folder exist. If not, generates them
@@ -376,24 +384,15 @@ def generate_missing_assets(assets, project_dir):
             with open(temp_blueprint, "w", encoding="utf-8") as f:
                 f.write(html_content)
             
-            # 3. Call canvas_render
-            import subprocess
+            # 3. Call canvas_render in-process so every asset reuses one browser launch
             try:
-                # Use sys.executable to ensure we use the same python environment
-                cmd = [sys.executable, render_script, temp_blueprint, full_output_path, "#canvas-container", "0.5"]
-                print(f"[EXEC] {' '.join(cmd)}")
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0 and os.path.exists(full_output_path):
+                render_canvas = _load_render_canvas(render_script)
+                print(f"[EXEC] render_canvas({temp_blueprint}, {full_output_path})")
+                if render_canvas(temp_blueprint, full_output_path, "#canvas-container", 0.5) and os.path.exists(full_output_path):
                     print(f"[OK] Generated {output_file}")
                 else:
                     all_ok = False
-                    stderr = (result.stderr or "").strip()
-                    stdout = (result.stdout or "").strip()
-                    print(f"[ERROR] Failed to generate {output_file} (exit={result.returncode}).")
-                    if stderr:
-                        print(f"[STDERR] {stderr}")
-                    if stdout:
-                        print(f"[STDOUT] {stdout}")
+                    print(f"[ERROR] Failed to generate {output_file}.")
             except Exception as e:
                 all_ok = False
                 print(f"[ERROR] Exception while calling renderer: {e}")
@@ -11,6 +11,14 @@ except Exception:  # pragma: no cover
     except Exception:
         from all_new_cbot import core  # type: ignore
 
+try:
+    import listener
+except Exception:  # pragma: no cover
+    try:
+        from codex_cbot_telegram import listener  # type: ignore
+    except Exception:
+        from all_new_cbot import listener  # type: ignore
+
 try:
     import telegram_sender as sender
 except Exception:  # pragma: no cover
@@ -25,9 +33,7 @@ POST_WORK_WAIT = int(os.getenv("TELEGRAM_POST_WORK_WAIT", "180"))
 LOCK_FILE = "working.lock"
 HEARTBEAT_INTERVAL = int(os.getenv("TELEGRAM_PROGRESS_HEARTBEAT", "45"))
 TASK_TIMEOUT = int(os.getenv("TELEGRAM_TASK_TIMEOUT", "900"))
-CODEX_MODEL = os.getenv("CODEX_MODEL", "gpt-5-codex")
 ALLOW_NESTED_CODEX = os.getenv("ALLOW_NESTED_CODEX", "0")
-MACOS_STRICT_MODE = os.getenv("MACOS_STRICT_MODE", "0")
 
 
 def check_telegram():
@@ -65,99 +71,12 @@ def _is_nested_codex_call_blocked():
     return bool(os.getenv("CODEX_THREAD_ID")) and ALLOW_NESTED_CODEX != "1"
 
 
-def _is_enabled(raw_value):
-    return str(raw_value).strip().lower() in ("1", "true", "yes", "on")
-
-
-def _read_log_increment(log_path, offset):
-    if not os.path.exists(log_path):
-        return [], offset
-    try:
-        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
-            f.seek(offset)
-            chunk = f.read()
-            new_offset = f.tell()
-        return chunk.splitlines(), new_offset
-    except Exception:
-        return [], offset
-
-
-def _tail_log(log_path, max_lines=40):
-    if not os.path.exists(log_path):
-        return []
-    try:
-        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
-            return f.read().splitlines()[-max_lines:]
-    except Exception:
-        return []
-
-
-def _progress_from_line(line):
-    l = (line or "").lower()
-    if "[recon]" in l:
-        return ("recon", "Market/domain analysis in progress.")
-    if "[copy]" in l:
-        return ("copy", "Copy strategy generation in progress.")
-    if "[variator]" in l:
-        return ("variator", "Design variation selection in progress.")
-    if "[builder]" in l:
-        return ("builder", "Building the web package.")
-    if "[generate]" in l or "image_gen subprocess" in l:
-        return ("assets", "Generating image assets.")
-    if "[motion]" in l:
-        return ("motion", "Applying motion/animation effects.")
-    if "[audit]" in l:
-        return ("audit", "Running quality audit.")
-    if "[done]" in l or "pipeline complete" in l:
-        return ("done", "Generation pipeline completed.")
-    if "[skip] codex busy" in l:
-        return ("busy", "Codex is currently busy with another task.")
-    if "[error]" in l or " failed" in l:
-        return ("warn", "Issue detected. Attempting recovery/check.")
-    return (None, None)
-
-
-def _build_executor_command(base_dir):
-    executor_sh = os.path.join(base_dir, "executor.sh")
-    codex_md = os.path.join(base_dir, "codex.md")
-    strict_mode = _is_enabled(MACOS_STRICT_MODE)
-
-    # Prefer shared executor when bash is available.
-    if os.path.exists(executor_sh) and _which("bash"):
-        return ["bash", executor_sh], "bash"
-
-    if strict_mode:
-        # macOS strict mode: do not allow direct fallback.
-        return None, "strict_bash_only"
-
-    # Windows-safe fallback.
-    if _which("codex"):
-        prompt = "Check messages.json and process the first 'processed: false' item using only core.py APIs, then mark as done."
-        return [
-            "codex",
-            "exec",
-            "--full-auto",
-            "-m",
-            CODEX_MODEL,
-            "--config",
-            f"developer_instructions_file={codex_md}",
-            prompt,
-        ], "direct"
-
-    return None, "none"
-
-
-def _which(name):
-    paths = os.environ.get("PATH", "").split(os.pathsep)
-    exts = [""]
-    if os.name == "nt":
-        exts.extend(os.environ.get("PATHEXT", ".EXE;.BAT;.CMD").split(";"))
-    for p in paths:
-        for ext in exts:
-            candidate = os.path.join(p, name + ext)
-            if os.path.isfile(candidate):
-                return candidate
-    return None
+# Log following, progress parsing and executor selection are shared with listener.py.
+_open_log = listener._open_log
+_read_new_lines = listener._read_new_lines
+_tail_log = listener._tail_log
+_progress_from_line = listener._progress_from_line
+_is_error_line = listener._is_error_line
 
 
 def _run_with_progress_updates(cmd, base_dir, chat_id, timeout_sec=TASK_TIMEOUT):
@@ -169,6 +88,7 @@ def _run_with_progress_updates(cmd, base_dir, chat_id, timeout_sec=TASK_TIMEOUT)
     last_heartbeat = start_time
 
     log_file = open(log_path, "a", encoding="utf-8")
+    log_fp = _open_log(log_path, log_offset)
     proc = subprocess.Popen(
         cmd,
         cwd=base_dir,
@@ -179,7 +99,7 @@ def _run_with_progress_updates(cmd, base_dir, chat_id, timeout_sec=TASK_TIMEOUT)
         while True:
             rc = proc.poll()
 
-            new_lines, log_offset = _read_log_increment(log_path, log_offset)
+            new_lines = _read_new_lines(log_fp)
             for line in new_lines:
                 key, msg = _progress_from_line(line)
                 if key and msg and key not in seen_progress:
@@ -204,7 +124,7 @@ def _run_with_progress_updates(cmd, base_dir, chat_id, timeout_sec=TASK_TIMEOUT)
 
             time.sleep(2)
 
-        new_lines, _ = _read_log_increment(log_path, log_offset)
+        new_lines = _read_new_lines(log_fp)
         for line in new_lines:
             key, msg = _progress_from_line(line)
             if key and msg and key not in seen_progress:
@@ -215,17 +135,19 @@ def _run_with_progress_updates(cmd, base_dir, chat_id, timeout_sec=TASK_TIMEOUT)
             return True, "Codex skill execution successful"
 
         tail = _tail_log(log_path, max_lines=30)
-        err_line = next((x for x in reversed(tail) if "error" in x.lower() or "failed" in x.lower()), "")
+        err_line = next((x for x in reversed(tail) if _is_error_line(x)), "")
         if not err_line and tail:
             err_line = tail[-1]
         if err_line:
             return False, f"Codex failed: {err_line[:200]}"
         return False, "Codex failed: unknown error"
     finally:
-        try:
-            log_file.close()
-        except Exception:
-            pass
+        for f in (log_file, log_fp):
+            try:
+                if f is not None:
+                    f.close()
+            except Exception:
+                pass
 
 
 def execute_task(message):
@@ -244,7 +166,7 @@ def execute_task(message):
         return False, msg
 
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    cmd, mode = _build_executor_command(base_dir)
+    cmd, mode = listener._build_executor_command()
     if not cmd:
         if mode == "strict_bash_only":
             msg = "macOS strict mode is enabled: bash+executor.sh is required and direct fallback is disabled."
@@ -279,8 +201,7 @@ def run_agent_loop():
                     time.sleep(POLL_INTERVAL)
                     continue
 
-                raw_allowed = os.getenv("TELEGRAM_ALLOWED_USERS", "").split(",")
-                fallback_chat = next((x for x in raw_allowed if x.strip()), "")
+                fallback_chat = core.ALLOWED_USER_IDS[0] if core.ALLOWED_USER_IDS else ""
                 chat_id = task_msg.get("chat_id", fallback_chat)
 
                 create_working_lock(message_id=task_msg.get("message_id"))
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import core
+import listener
+import router
+
+
+def _write_json(path: Path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def _read_json(path: Path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _setup_queue(monkeypatch, tmp_path: Path, count: int):
+    messages = tmp_path / "messages.json"
+    journal = tmp_path / "processed.jsonl"
+    _write_json(
+        messages,
+        {
+            "messages": [
+                {"message_id": i, "chat_id": 10001, "text": f"task {i}", "processed": False}
+                for i in range(1, count + 1)
+            ],
+            "last_update_id": 0,
+        },
+    )
+    monkeypatch.setattr(core, "MESSAGES_FILE", str(messages))
+    monkeypatch.setattr(core, "PROCESSED_LOG", str(journal))
+    monkeypatch.setattr(router, "MESSAGES_FILE", str(messages))
+    monkeypatch.setattr(router, "PROCESSED_LOG", str(journal))
+    monkeypatch.setattr(core, "INBOX_LOG", str(tmp_path / "messages.jsonl"))
+    monkeypatch.setattr(core, "LAST_UPDATE_FILE", str(tmp_path / "last_update_id.txt"))
+    monkeypatch.setattr(router, "INBOX_LOG", str(tmp_path / "messages.jsonl"))
+    monkeypatch.setattr(core.memory, "update_index", lambda **kwargs: kwargs)
+    return messages, journal
+
+
+def test_mark_as_done_journals_ack_without_rewriting_queue(monkeypatch, tmp_path):
+    messages, journal = _setup_queue(monkeypatch, tmp_path, 3)
+    monkeypatch.setattr(core, "ACK_COMPACT_EVERY", 16)
+
+    core.mark_as_done(1, summary="done")
+
+    assert all(m["processed"] is False for m in _read_json(messages)["messages"])
+    assert [json.loads(line)["message_id"] for line in journal.read_text(encoding="utf-8").splitlines()] == [1]
+    assert [m["message_id"] for m in core.check_messages()] == [2, 3]
+    assert router.first_unprocessed_message()["message_id"] == 2
+
+
+def test_mark_as_done_compacts_journal_into_queue(monkeypatch, tmp_path):
+    messages, journal = _setup_queue(monkeypatch, tmp_path, 3)
+    monkeypatch.setattr(core, "ACK_COMPACT_EVERY", 2)
+
+    core.mark_as_done(1)
+    core.mark_as_done(2)
+
+    assert [m["processed"] for m in _read_json(messages)["messages"]] == [True, True, False]
+    assert journal.read_text(encoding="utf-8") == ""
+    assert [m["message_id"] for m in core.check_messages()] == [3]
+
+
+def test_check_messages_sees_external_queue_rewrites(monkeypatch, tmp_path):
+    messages, _ = _setup_queue(monkeypatch, tmp_path, 2)
+
+    assert [m["message_id"] for m in core.check_messages()] == [1, 2]
+
+    data = _read_json(messages)
+    data["messages"][0]["processed"] = True
+    _write_json(messages, data)
+
+    pending = core.check_messages()
+    assert [m["message_id"] for m in pending] == [2]
+
+    pending[0]["processed"] = True
+    assert [m["message_id"] for m in core.check_messages()] == [2]
+
+
+def test_mark_as_done_finds_messages_after_queue_reorder(monkeypatch, tmp_path):
+    messages, journal = _setup_queue(monkeypatch, tmp_path, 3)
+    monkeypatch.setattr(core, "ACK_COMPACT_EVERY", 16)
+
+    core.mark_as_done(1)
+
+    data = _read_json(messages)
+    data["messages"].reverse()
+    data["messages"].append({"message_id": 4, "chat_id": 10001, "text": "task 4", "processed": False})
+    _write_json(messages, data)
+
+    core.mark_as_done(4)
+    core.mark_as_done(99)
+
+    assert [json.loads(line)["message_id"] for line in journal.read_text(encoding="utf-8").splitlines()] == [1, 4]
+    assert [m["message_id"] for m in core.check_messages()] == [3, 2]
+
+
+def test_acks_only_cover_the_message_they_name_when_ids_collide(monkeypatch, tmp_path):
+    messages, journal = _setup_queue(monkeypatch, tmp_path, 2)
+    monkeypatch.setattr(core, "ACK_COMPACT_EVERY", 3)
+    data = _read_json(messages)
+    # A Telegram message and a web simulator message that happen to share id 1.
+    data["messages"].append({"message_id": 1, "chat_id": 777, "text": "telegram 1", "processed": False})
+    _write_json(messages, data)
+
+    core.mark_as_done(1)
+    assert [(m["chat_id"], m["message_id"]) for m in core.check_messages()] == [(10001, 2), (777, 1)]
+    assert router.first_unprocessed_message()["message_id"] == 2
+
+    core.mark_as_done(1, chat_id=777)
+    assert [(m["chat_id"], m["message_id"]) for m in core.check_messages()] == [(10001, 2)]
+    assert router.first_unprocessed_message()["message_id"] == 2
+
+    core.mark_as_done(2)
+    assert [m["processed"] for m in _read_json(messages)["messages"]] == [True, True, True]
+    assert journal.read_text(encoding="utf-8") == ""
+
+
+def test_listener_inbox_is_queued_and_folded_on_compaction(monkeypatch, tmp_path):
+    messages, journal = _setup_queue(monkeypatch, tmp_path, 1)
+    inbox = tmp_path / "messages.jsonl"
+    monkeypatch.setattr(core, "ACK_COMPACT_EVERY", 2)
+    monkeypatch.setattr(listener, "MESSAGES_FILE", str(messages))
+    monkeypatch.setattr(listener, "MESSAGES_JSONL", str(inbox))
+    monkeypatch.setattr(listener, "LAST_ID_FILE", str(tmp_path / "last_update_id.txt"))
+
+    assert listener.load_last_update_id() == 0
+    listener.append_msgs([{"message_id": 2, "chat_id": 10001, "text": "task 2", "processed": False}], 41)
+    listener.append_msgs([], 42)
+
+    assert listener.load_last_update_id() == 42
+    assert [m["message_id"] for m in core.check_messages()] == [1, 2]
+
+    core.mark_as_done(1)
+    assert router.first_unprocessed_message()["message_id"] == 2
+
+    core.mark_as_done(2)
+    data = _read_json(messages)
+    assert [(m["message_id"], m["processed"]) for m in data["messages"]] == [(1, True), (2, True)]
+    assert data["last_update_id"] == 42
+    assert inbox.read_text(encoding="utf-8") == ""
+    assert journal.read_text(encoding="utf-8") == ""
+    assert core.check_messages() == []
+
+
+def test_compaction_never_drops_a_concurrent_listener_append(monkeypatch, tmp_path):
+    messages, journal = _setup_queue(monkeypatch, tmp_path, 0)
+    inbox = tmp_path / "messages.jsonl"
+    # Even with the single-process fast path on, the fold must flock against the listener.
+    monkeypatch.setattr(core, "MULTIPROC", False)
+    monkeypatch.setattr(core, "ACK_COMPACT_EVERY", 1)
+    total = 200
+
+    child = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            textwrap.dedent(
+                f"""
+                import sys
+                sys.path.insert(0, {str(Path(__file__).resolve().parents[1])!r})
+                import listener
+                listener.MESSAGES_FILE = {str(messages)!r}
+                listener.MESSAGES_JSONL = {str(inbox)!r}
+                listener.LAST_ID_FILE = {str(tmp_path / "last_update_id.txt")!r}
+                for i in range(1, {total} + 1):
+                    listener.append_msgs([{{"message_id": i, "chat_id": 10001, "text": "t", "processed": False}}], i)
+                """
+            ),
+        ]
+    )
+    try:
+        # Ack (and therefore fold + truncate the inbox) as fast as messages arrive.
+        while child.poll() is None:
+            for m in core.check_messages():
+                core.mark_as_done(m["message_id"])
+    finally:
+        child.wait(timeout=60)
+    assert child.returncode == 0
+    for m in core.check_messages():
+        core.mark_as_done(m["message_id"])
+
+    folded = [m["message_id"] for m in _read_json(messages)["messages"]]
+    assert sorted(folded) == list(range(1, total + 1))
+    assert inbox.read_text(encoding="utf-8") == ""
+
+
+def test_working_state_file_exists_only_while_active(monkeypatch, tmp_path):
+    working = tmp_path / "working.json"
+    monkeypatch.setattr(core, "WORKING_FILE", str(working))
+
+    assert core.is_working() is False
+
+    core.set_working(True, message_id=7)
+    assert _read_json(working)["message_id"] == 7
+    assert core.is_working() is True
+
+    core.set_working(False)
+    assert not working.exists()
+    assert core.is_working() is False
+    core.set_working(False)
+
+    _write_json(working, {"active": False, "message_id": None, "time": ""})
+    assert core.is_working() is False
+
+
+def test_each_event_loop_gets_a_bot_that_is_closed_with_it(monkeypatch):
+    closed = []
+
+    class FakeRequest:
+        async def shutdown(self):
+            closed.append(self)
+
+    class FakeBot:
+        def __init__(self, token, request=None):
+            self.request = request or FakeRequest()
+
+        async def shutdown(self):
+            pass
+
+    monkeypatch.setattr(core, "Bot", FakeBot)
+    monkeypatch.setattr(core, "HTTPXRequest", lambda **kwargs: FakeRequest())
+
+    async def use_bot():
+        bot = core._get_bot()
+        assert core._get_bot() is bot
+        return bot
+
+    first = asyncio.run(use_bot())
+    assert closed == [first.request]
+    second = asyncio.run(use_bot())
+    assert second is not first
+    assert closed == [first.request, second.request]
+    assert len(core._BOTS) == 0
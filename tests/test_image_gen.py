@@ -0,0 +1,224 @@
+import asyncio
+import os
+import struct
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import zlib
+
+from skills.image_gen import image_gen
+
+
+def test_generate_image_reuses_cached_provider_output(monkeypatch, tmp_path):
+    monkeypatch.setenv("IMAGE_GEN_PROVIDER", "stock")
+    monkeypatch.setattr(image_gen, "GEN_DIR", str(tmp_path))
+    monkeypatch.setattr(image_gen, "CACHE_DIR", str(tmp_path / "cache"))
+    calls = []
+
+    def fake_stock(prompt, image_path):
+        calls.append(prompt)
+        with open(image_path, "wb") as f:
+            f.write(b"\x89PNG" + b"x" * (20 * 1024))
+        return {"ok": True, "provider": "stock", "image_path": image_path}
+
+    monkeypatch.setattr(image_gen, "_generate_with_stock_photo", fake_stock)
+
+    first = asyncio.run(image_gen.generate_image("cafe counter"))
+    assert first["ok"] is True and "cached" not in first
+
+    second = asyncio.run(image_gen.generate_image("cafe counter"))
+    assert second["ok"] is True
+    assert second["cached"] is True
+    assert second["provider"] == "stock"
+    assert calls == ["cafe counter"]
+    with open(second["image_path"], "rb") as f:
+        assert len(f.read()) == 4 + 20 * 1024
+
+    monkeypatch.setenv("STOCK_IMAGE_WIDTH", "800")
+    third = asyncio.run(image_gen.generate_image("cafe counter"))
+    assert "cached" not in third
+    assert calls == ["cafe counter", "cafe counter"]
+
+    monkeypatch.setenv("IMAGE_GEN_CACHE", "0")
+    asyncio.run(image_gen.generate_image("cafe counter"))
+    assert len(calls) == 3
+
+
+def test_stock_photo_takes_the_first_host_to_answer(monkeypatch, tmp_path):
+    monkeypatch.delenv("STOCK_IMAGE_URL_TEMPLATE", raising=False)
+    slow_started = threading.Event()
+    release = threading.Event()
+
+    def fake_fetch(url, timeout):
+        if "picsum" in url:
+            slow_started.set()
+            release.wait(5)
+            return b"slow" * 8192
+        slow_started.wait(5)
+        return b"fast" * 8192
+
+    monkeypatch.setattr(image_gen, "_fetch_stock_bytes", fake_fetch)
+    monkeypatch.setattr(image_gen, "_write_png", lambda binary, path: False)
+    try:
+        result = image_gen._generate_with_stock_photo("cafe", str(tmp_path / "out.png"))
+    finally:
+        release.set()
+
+    assert result["ok"] is True
+    assert "loremflickr" in result["meta"]["url"]
+    assert (tmp_path / "out.png").read_bytes().startswith(b"fast")
+
+
+def test_stock_race_loser_does_not_hold_the_process_open():
+    script = textwrap.dedent(
+        """
+        import time
+        from skills.image_gen import image_gen
+
+        def fake_fetch(url, timeout):
+            time.sleep(30 if "slow" in url else 0)
+            return url.encode()
+
+        image_gen._fetch_stock_bytes = fake_fetch
+        urls = ["https://slow.example/a", "https://fast.example/b"]
+        print(next(image_gen._fetch_in_completion_order([urls], 30))[0])
+        """
+    )
+    started = time.monotonic()
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "https://fast.example/b"
+    assert time.monotonic() - started < 15
+
+
+def test_run_codex_keeps_stdout_tail_and_reports_timeout():
+    script = (
+        "import sys\n"
+        "prompt = sys.stdin.read()\n"
+        "for i in range(5000):\n"
+        "    print('progress', i)\n"
+        "print('{\"ok\": true, \"echo\": \"%s\"}' % prompt)\n"
+        "sys.stderr.write('model_not_found\\n')\n"
+    )
+    returncode, stdout, stderr = image_gen._run_codex([sys.executable, "-c", script], "draw", 30, dict(os.environ))
+    assert returncode == 0
+    assert len(stdout.splitlines()) == image_gen.CODEX_STDOUT_TAIL_LINES
+    assert image_gen._parse_payload_line(stdout) == {"ok": True, "echo": "draw"}
+    assert "model_not_found" in stderr
+
+    returncode, _, _ = image_gen._run_codex([sys.executable, "-c", "import time; time.sleep(30)"], "", 1, dict(os.environ))
+    assert returncode is None
+
+
+def _png_bytes(width=96, height=64):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    raw = b"".join(b"\x00" + os.urandom(width * 3) for _ in range(height))
+    return (
+        image_gen.PNG_SIGNATURE
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 0))
+        + chunk(b"IEND", b"")
+    )
+
+
+def test_stock_photo_rejects_truncated_png(monkeypatch, tmp_path):
+    monkeypatch.delenv("STOCK_IMAGE_URL_TEMPLATE", raising=False)
+    monkeypatch.setenv("STOCK_IMAGE_RETRIES", "1")
+    png = _png_bytes()
+    payloads = {"picsum": png[:-200], "loremflickr": png}
+
+    def fake_fetch(url, timeout):
+        return next(body for host, body in payloads.items() if host in url)
+
+    monkeypatch.setattr(image_gen, "_fetch_stock_bytes", fake_fetch)
+    result = image_gen._generate_with_stock_photo("cafe", str(tmp_path / "out.png"))
+    assert result["ok"] is True
+    assert "loremflickr" in result["meta"]["url"]
+    assert (tmp_path / "out.png").read_bytes() == png
+
+    payloads["loremflickr"] = png[:-200]
+    result = image_gen._generate_with_stock_photo("cafe", str(tmp_path / "bad.png"))
+    assert result["ok"] is False
+    assert "truncated or corrupt PNG" in result["error"]
+
+
+def test_async_canvas_renders_share_a_browser_that_closes_after_the_last(monkeypatch, tmp_path):
+    from skills.image_gen import canvas_render
+
+    events = []
+
+    class FakeLocator:
+        async def count(self):
+            return 1
+
+        async def screenshot(self, path):
+            await asyncio.sleep(0.01)
+            with open(path, "wb") as f:
+                f.write(b"png")
+
+    class FakePage:
+        async def goto(self, url):
+            pass
+
+        async def evaluate(self, script):
+            return script == canvas_render._HAS_READY_SIGNAL
+
+        async def wait_for_function(self, script, timeout):
+            pass
+
+        def locator(self, selector):
+            return FakeLocator()
+
+    class FakeContext:
+        async def new_page(self):
+            return FakePage()
+
+        async def close(self):
+            pass
+
+    class FakeBrowser:
+        def is_connected(self):
+            return True
+
+        async def new_context(self, viewport):
+            return FakeContext()
+
+        async def close(self):
+            events.append("browser closed")
+
+    class FakePlaywright:
+        class chromium:
+            @staticmethod
+            async def launch(headless):
+                events.append("launch")
+                return FakeBrowser()
+
+        async def stop(self):
+            events.append("playwright stopped")
+
+    class FakeStarter:
+        async def start(self):
+            return FakePlaywright()
+
+    monkeypatch.setattr(canvas_render, "async_playwright", FakeStarter)
+    html = tmp_path / "page.html"
+    html.write_text("<html></html>", encoding="utf-8")
+
+    async def render_three():
+        return await asyncio.gather(
+            *(canvas_render.render_canvas_async(str(html), str(tmp_path / f"{i}.png"), wait_time=0) for i in range(3))
+        )
+
+    assert asyncio.run(render_three()) == [True, True, True]
+    assert events == ["launch", "browser closed", "playwright stopped"]
+    assert canvas_render._ASYNC_STATE == {}
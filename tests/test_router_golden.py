@@ -41,3 +41,22 @@ def test_router_payload_matches_golden_snapshot(case):
     payload = _run_router(case["text"], case["message_id"])
     assert payload == case["expected"]
 
+
+
+def test_classify_counts_nested_and_overlapping_keywords():
+    import router
+
+    # 웹 and 사이트 sit inside 웹사이트, and web page overlaps it; each distinct keyword scores once.
+    task, domain, style = router.classify("웹사이트 웹사이트 web page")
+    assert task == ("web_page", "web_keywords_detected", 0.8)
+    assert domain == ("general", "no_domain_keyword", 0.2)
+    assert style == "auto"
+    assert router.classify("  ") == (("general", "empty_instruction", 0.0),) * 2 + ("auto",)
+
+
+def test_batch_route_payloads_match_single_routing():
+    import router
+
+    msgs = [{"message_id": c["message_id"], "chat_id": 10001, "text": c["text"]} for c in CASES]
+    msgs.append({"message_id": 0, "chat_id": 10001, "text": "   "})
+    assert router.batch_route_payloads(msgs) == [router.build_route_payload(m) for m in msgs]
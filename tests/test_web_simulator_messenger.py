@@ -32,6 +32,8 @@ def _setup_webmock_paths(monkeypatch, tmp_path: Path):
 
     monkeypatch.setattr(webmock, "ROOT", tmp_path)
     monkeypatch.setattr(webmock, "MESSAGES_FILE", messages)
+    monkeypatch.setattr(webmock, "PROCESSED_LOG", tmp_path / "processed.jsonl")
+    monkeypatch.setattr(webmock, "INBOX_LOG", tmp_path / "messages.jsonl")
     monkeypatch.setattr(webmock, "OUTBOX_FILE", outbox)
     monkeypatch.setattr(webmock, "HISTORY_FILE", history)
     monkeypatch.setattr(webmock, "WORKING_FILE", working)
@@ -72,6 +74,30 @@ def test_core_webmock_channel_writes_outbox(monkeypatch, tmp_path):
     assert msgs[2]["file_path"] == "sample.txt"
 
 
+def test_core_webmock_coalesces_concurrent_sends(monkeypatch, tmp_path):
+    outbox = tmp_path / "web_outbox.json"
+    _write_json(outbox, {"messages": []})
+
+    monkeypatch.setattr(core, "MESSAGE_CHANNEL", "webmock")
+    monkeypatch.setattr(core, "WEB_OUTBOX_FILE", str(outbox))
+
+    saves = []
+    real_save_json = core.save_json
+
+    def counting_save_json(path, data, **kwargs):
+        saves.append(path)
+        return real_save_json(path, data, **kwargs)
+
+    monkeypatch.setattr(core, "save_json", counting_save_json)
+
+    async def burst():
+        return await asyncio.gather(*(core.send_message(10001, f"part {i}") for i in range(5)))
+
+    assert asyncio.run(burst()) == [True] * 5
+    assert saves == [str(outbox)]
+    assert [m["text"] for m in _read_json(outbox)["messages"]] == [f"part {i}" for i in range(5)]
+
+
 def test_webmock_api_endpoints(monkeypatch, tmp_path):
     paths = _setup_webmock_paths(monkeypatch, tmp_path)
 
@@ -127,6 +153,25 @@ def test_webmock_api_endpoints(monkeypatch, tmp_path):
         webmock._safe_file_path("../outside.txt")
     assert getattr(exc.value, "status_code", None) == 403
 
+    # A sibling directory sharing ROOT's name as a prefix is still outside ROOT.
+    sibling = tmp_path.parent / (tmp_path.name + "-sibling")
+    sibling.mkdir()
+    (sibling / "secret.txt").write_text("secret", encoding="utf-8")
+    with pytest.raises(Exception) as exc:
+        webmock._safe_file_path(f"../{sibling.name}/secret.txt")
+    assert getattr(exc.value, "status_code", None) == 403
+
+    (tmp_path / "artifact.txt").unlink()
+    assert client.get("/api/files/artifact.txt").status_code == 404
+
+    # A symlink repointed outside ROOT after it was first served must be refused.
+    (tmp_path / "inside.txt").write_text("inside", encoding="utf-8")
+    (tmp_path / "link.txt").symlink_to(tmp_path / "inside.txt")
+    assert client.get("/api/files/link.txt").content == b"inside"
+    (tmp_path / "link.txt").unlink()
+    (tmp_path / "link.txt").symlink_to(sibling / "secret.txt")
+    assert client.get("/api/files/link.txt").status_code == 403
+
 
 def test_webmock_message_to_result_integration(monkeypatch, tmp_path):
     paths = _setup_webmock_paths(monkeypatch, tmp_path)
@@ -179,6 +224,106 @@ def test_webmock_clear_debug_log(monkeypatch, tmp_path):
     assert paths["log"].read_text(encoding="utf-8") == ""
 
 
+def test_webmock_status_revalidates_with_etag(monkeypatch, tmp_path):
+    paths = _setup_webmock_paths(monkeypatch, tmp_path)
+    client = TestClient(webmock.app)
+
+    first = client.get("/api/status")
+    assert first.status_code == 200
+    assert first.json()["pending_count"] == 0
+    etag = first.headers["etag"]
+
+    unchanged = client.get("/api/status", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    paths["log"].write_text("step done\n", encoding="utf-8")
+    changed = client.get("/api/status", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["log_tail"] == ["step done"]
+
+
+def test_webmock_status_log_follows_byte_offset(monkeypatch, tmp_path):
+    paths = _setup_webmock_paths(monkeypatch, tmp_path)
+    paths["log"].write_text("a\nb\n", encoding="utf-8")
+    client = TestClient(webmock.app)
+
+    status = client.get("/api/status?log_tail=0").json()
+    assert "log_tail" not in status
+    assert status["log_size"] == 4
+
+    first = client.get("/api/status/log").json()
+    assert first == {"ok": True, "offset": 4, "size": 4, "reset": True, "lines": ["a", "b"], "partial": ""}
+
+    with paths["log"].open("a", encoding="utf-8") as f:
+        f.write("c\npart")
+    nxt = client.get(f"/api/status/log?since={first['offset']}").json()
+    assert nxt == {"ok": True, "offset": 6, "size": 10, "reset": False, "lines": ["c"], "partial": "part"}
+
+    with paths["log"].open("a", encoding="utf-8") as f:
+        f.write("ial\n")
+    done = client.get(f"/api/status/log?since={nxt['offset']}").json()
+    assert done == {"ok": True, "offset": 14, "size": 14, "reset": False, "lines": ["partial"], "partial": ""}
+
+    client.post("/api/debug/clear")
+    cleared = client.get(f"/api/status/log?since={done['offset']}").json()
+    assert cleared == {"ok": True, "offset": 0, "size": 0, "reset": True, "lines": [], "partial": ""}
+
+
+def test_webmock_messages_revalidate_with_etag(monkeypatch, tmp_path):
+    paths = _setup_webmock_paths(monkeypatch, tmp_path)
+    client = TestClient(webmock.app)
+
+    first = client.get("/api/messages")
+    assert first.status_code == 200
+    assert first.json() == {"ok": True, "messages": []}
+    etag = first.headers["etag"]
+
+    unchanged = client.get("/api/messages", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    _write_json(
+        paths["outbox"],
+        {"messages": [{"type": "message", "chat_id": 10001, "text": "fresh", "timestamp": "2026-01-01 00:00:01"}]},
+    )
+    changed = client.get("/api/messages", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert [m["text"] for m in changed.json()["messages"]] == ["fresh"]
+
+
+def test_webmock_timeline_reuses_cache_until_sources_change(monkeypatch, tmp_path):
+    paths = _setup_webmock_paths(monkeypatch, tmp_path)
+    monkeypatch.setattr(webmock, "_TIMELINE_CACHE", (None, None))
+    _write_json(
+        paths["outbox"],
+        {"messages": [{"type": "message", "chat_id": 10001, "text": "hello", "timestamp": "2026-01-01 00:00:01"}]},
+    )
+
+    loads = []
+    real_load_queue = webmock._load_queue
+    monkeypatch.setattr(webmock, "_load_queue", lambda: loads.append(1) or real_load_queue())
+
+    first = webmock._to_timeline()
+    assert [m["text"] for m in first] == ["hello"]
+    assert webmock._to_timeline() == first
+    assert len(loads) == 1
+
+    _write_json(
+        paths["outbox"],
+        {
+            "messages": [
+                {"type": "message", "chat_id": 10001, "text": "hello", "timestamp": "2026-01-01 00:00:01"},
+                {"type": "message", "chat_id": 10001, "text": "again", "timestamp": "2026-01-01 00:00:02"},
+            ]
+        },
+    )
+    assert [m["text"] for m in webmock._to_timeline()] == ["hello", "again"]
+    assert len(loads) == 2
+
+
 def test_webmock_history_persists_when_source_files_reset(monkeypatch, tmp_path):
     paths = _setup_webmock_paths(monkeypatch, tmp_path)
 
@@ -219,6 +364,37 @@ def test_webmock_history_persists_when_source_files_reset(monkeypatch, tmp_path)
     assert any(m.get("direction") == "out" and m.get("text") == "remembered response" for m in second_timeline)
 
 
+def test_webmock_history_writer_persists_posted_messages(monkeypatch, tmp_path):
+    paths = _setup_webmock_paths(monkeypatch, tmp_path)
+    monkeypatch.setattr(webmock, "_trigger_executor", lambda: {"ok": True, "triggered": True})
+    client = TestClient(webmock.app)
+
+    for text in ("first queued", "second queued"):
+        assert client.post("/api/messages", json={"text": text, "chat_id": 10001, "user": "Tester"}).status_code == 200
+    webmock._flush_history()
+
+    stored = json.loads(paths["history"].read_text(encoding="utf-8"))["messages"]
+    assert [m["text"] for m in stored] == ["first queued", "second queued"]
+    assert all(m.get("history_key", "").startswith("in-") for m in stored)
+
+
+def test_webmock_message_ids_continue_after_folded_messages(monkeypatch, tmp_path):
+    paths = _setup_webmock_paths(monkeypatch, tmp_path)
+    monkeypatch.setattr(webmock, "_trigger_executor", lambda: {"ok": True, "triggered": True})
+    client = TestClient(webmock.app)
+
+    first = client.post("/api/messages", json={"text": "one", "chat_id": 10001, "user": "Tester"}).json()
+    assert first["message"]["message_id"] == 1
+
+    # Simulate core folding a higher-numbered inbox message into the queue file.
+    data = json.loads(paths["messages"].read_text(encoding="utf-8"))
+    data["messages"].append({"message_id": 40, "chat_id": 10001, "text": "folded", "processed": False})
+    _write_json(paths["messages"], data)
+
+    second = client.post("/api/messages", json={"text": "two", "chat_id": 10001, "user": "Tester"}).json()
+    assert second["message"]["message_id"] == 41
+
+
 def test_webmock_control_retrigger(monkeypatch, tmp_path):
     _setup_webmock_paths(monkeypatch, tmp_path)
 
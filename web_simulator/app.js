@@ -14,7 +14,10 @@ const stopWorkerBtnEl = document.getElementById('stopWorkerBtn');
 const controlStatusEl = document.getElementById('controlStatus');
 
 let lastSignature = '';
-let lastLogSignature = '';
+let logOffset = -1;
+// Log size the current view covers, and the unfinished last line shown at its end.
+let logSeenSize = -1;
+let logPartial = '';
 let debugLines = [];
 
 const DEBUG_MAX_LINES = 2000;
@@ -24,21 +27,6 @@ function isNearBottom(el, threshold = 24) {
   return remaining <= threshold;
 }
 
-function findOverlap(prevLines, nextLines) {
-  const max = Math.min(prevLines.length, nextLines.length);
-  for (let size = max; size > 0; size -= 1) {
-    let matched = true;
-    for (let i = 0; i < size; i += 1) {
-      if (prevLines[prevLines.length - size + i] !== nextLines[i]) {
-        matched = false;
-        break;
-      }
-    }
-    if (matched) return size;
-  }
-  return 0;
-}
-
 function setDebugContent(lines, keepBottom) {
   debugLines = lines.slice(-DEBUG_MAX_LINES);
   debugLogEl.textContent = debugLines.length ? debugLines.join('\n') : '로그 없음';
@@ -136,7 +124,9 @@ async function clearDebugLog() {
   try {
     const res = await fetch('/api/debug/clear', { method: 'POST' });
     if (!res.ok) throw new Error('clear failed');
-    lastLogSignature = '';
+    logOffset = -1;
+    logSeenSize = -1;
+    logPartial = '';
     debugLines = [];
     debugLogEl.textContent = '로그 없음';
     setButtonState(clearDebugBtnEl, 'Cleared');
@@ -165,8 +155,27 @@ async function loadMessages() {
   chatEl.scrollTop = chatEl.scrollHeight;
 }
 
+async function loadDebugLog(logSize) {
+  if (logSize === logSeenSize) return;
+  const res = await fetch(`/api/status/log?since=${logOffset}`);
+  const data = await res.json();
+  // The offset stops at the last newline; an unfinished line comes back as `partial`
+  // and is re-read next time, so it is shown provisionally and replaced then.
+  logOffset = Number(data.offset || 0);
+  logSeenSize = Number(data.size ?? logOffset);
+  const lines = Array.isArray(data.lines) ? data.lines : [];
+  const partial = typeof data.partial === 'string' ? data.partial : '';
+  if (!data.reset && lines.length === 0 && partial === logPartial) return;
+  const keepBottom = isNearBottom(debugLogEl);
+  let next = data.reset ? [] : logPartial ? debugLines.slice(0, -1) : debugLines;
+  next = next.concat(lines);
+  if (partial) next.push(partial);
+  logPartial = partial;
+  setDebugContent(next, keepBottom);
+}
+
 async function loadStatus() {
-  const res = await fetch('/api/status');
+  const res = await fetch('/api/status?log_tail=0');
   const data = await res.json();
 
   const working = data.working || {};
@@ -182,30 +191,7 @@ async function loadStatus() {
   const pendingIds = Array.isArray(data.pending_ids) ? data.pending_ids.join(', ') : '';
   debugMetaEl.textContent = pendingIds ? `pending: ${pendingCount} [${pendingIds}]` : `pending: ${pendingCount}`;
 
-  const logs = Array.isArray(data.log_tail) ? data.log_tail : [];
-  const logSignature = JSON.stringify(logs);
-  if (logSignature !== lastLogSignature) {
-    const keepBottom = isNearBottom(debugLogEl);
-    lastLogSignature = logSignature;
-    if (logs.length === 0) {
-      setDebugContent([], keepBottom);
-      return;
-    }
-
-    if (debugLines.length === 0) {
-      setDebugContent(logs, keepBottom);
-      return;
-    }
-
-    const overlap = findOverlap(debugLines, logs);
-    if (overlap === 0) {
-      setDebugContent(logs, keepBottom);
-      return;
-    }
-
-    const merged = debugLines.concat(logs.slice(overlap));
-    setDebugContent(merged, keepBottom);
-  }
+  await loadDebugLog(Number(data.log_size || 0));
 }
 
 formEl.addEventListener('submit', async (e) => {